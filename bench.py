@@ -0,0 +1,262 @@
+"""
+Benchmarks for the per-report hot path: decoding input reports, the getters,
+the PythonicJoyCon properties and the update hooks.
+
+    python bench.py                  # run and compare against bench_baseline.json
+    python bench.py --save           # run and store the results as the baseline
+    python bench.py --manager 32     # aggregate throughput of a JoyConManager
+    python bench.py --imports        # import time of the package (python -X importtime)
+
+Each layer is fed the same synthetic 0x30/0x31 reports produced by the
+emulated JoyCon, and is reported in ns/report and reports/sec. When a baseline
+exists any layer slower than it by more than --tolerance fails the run.
+"""
+import argparse
+import functools
+import gc
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from pyjoycon import JoyCon, PythonicJoyCon, ButtonEventJoyCon, GyroTrackingJoyCon
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+from pyjoycon.emulator import EmulatedJoyCon
+from pyjoycon.manager import JoyConManager
+from pyjoycon.state import decode_input_report
+
+
+def synthetic_reports(product_id, report_type, count, seed=0):
+    rng = random.Random(seed)
+
+    def on_report(emulator):
+        if rng.random() < 0.1:
+            emulator.buttons = rng.getrandbits(24)
+        emulator.stick_l = (rng.randrange(4096), rng.randrange(4096))
+        emulator.stick_r = (rng.randrange(4096), rng.randrange(4096))
+        emulator.accel = tuple(rng.randrange(-8000, 8000) for _ in range(3))
+        emulator.gyro = tuple(rng.randrange(-3000, 3000) for _ in range(3))
+
+    emulator = EmulatedJoyCon(product_id=product_id, report_rate=None, on_report=on_report)
+    emulator.write(b"\x01\x00" + bytes(8) + b"\x40\x01")
+    emulator.write(b"\x01\x00" + bytes(8) + b"\x03" + bytes((report_type,)))
+    reports = []
+    while len(reports) < count:
+        report = emulator.read(JoyCon._INPUT_REPORT_SIZE)
+        if report[0] == report_type:
+            reports.append(report)
+    return reports
+
+
+def make_joycon(cls, product_id, **kw):
+    backend = functools.partial(EmulatedJoyCon, report_rate=None)
+    joycon = cls(JOYCON_VENDOR_ID, product_id, backend=backend, **kw)
+    joycon.close()  # the benchmarks drive the report handling themselves
+    return joycon
+
+
+def bench_decode(joycon, reports):
+    for report in reports:
+        decode_input_report(report)
+
+
+def bench_get_status(joycon, reports):
+    for report in reports:
+        joycon._input_report = report
+        joycon._input_state = decode_input_report(report)
+        joycon.get_status()
+
+
+def bench_getters(joycon, reports):
+    getters = [getattr(joycon, name) for name in dir(JoyCon)
+               if name.startswith(("get_button_", "get_stick_"))]
+    imu = (joycon.get_accel_x, joycon.get_accel_y, joycon.get_accel_z,
+           joycon.get_gyro_x, joycon.get_gyro_y, joycon.get_gyro_z)
+    for report in reports:
+        joycon._input_report = report
+        joycon._input_state = decode_input_report(report)
+        for getter in getters:
+            getter()
+        for getter in imu:
+            for i in range(3):
+                getter(i)
+
+
+def bench_pythonic_imu(joycon, reports):
+    for report in reports:
+        joycon._input_report = report
+        joycon._input_state = decode_input_report(report)
+        joycon.accel
+        joycon.gyro
+
+
+def bench_imu_array(joycon, reports):
+    for report in reports:
+        joycon._input_report = report
+        joycon.imu_array()
+
+
+def bench_imu_array_batch(joycon, reports):
+    joycon.imu_array(reports)
+
+
+def bench_handle(joycon, reports):
+    for report in reports:
+        joycon._handle_input_report(report)
+
+
+def bench_button_events(joycon, reports):
+    for report in reports:
+        joycon._handle_input_report(report)
+        for event in joycon.events():
+            pass
+
+
+def bench_gyro_hook(joycon, reports):
+    hook = joycon._gyro_update_hook
+    for report in reports:
+        joycon._input_report = report
+        joycon._input_state = decode_input_report(report)
+        hook(joycon)
+
+
+def layers():
+    r30 = synthetic_reports(JOYCON_R_PRODUCT_ID, 0x30, 2000)
+    r31 = synthetic_reports(JOYCON_R_PRODUCT_ID, 0x31, 2000, seed=1)
+    l30 = synthetic_reports(JOYCON_L_PRODUCT_ID, 0x30, 2000, seed=2)
+
+    joycon = make_joycon(JoyCon, JOYCON_R_PRODUCT_ID)
+    pythonic = make_joycon(PythonicJoyCon, JOYCON_L_PRODUCT_ID)
+    events_r = make_joycon(ButtonEventJoyCon, JOYCON_R_PRODUCT_ID)
+    events_l = make_joycon(ButtonEventJoyCon, JOYCON_L_PRODUCT_ID)
+    gyro = make_joycon(GyroTrackingJoyCon, JOYCON_R_PRODUCT_ID)
+    history = make_joycon(JoyCon, JOYCON_R_PRODUCT_ID, history=1024)
+    metrics = make_joycon(ButtonEventJoyCon, JOYCON_R_PRODUCT_ID, metrics=True)
+
+    benchmarks = [
+        ("JoyCon.get_status 0x30",          bench_get_status,    joycon,   r30),
+        ("JoyCon.get_status 0x31",          bench_get_status,    joycon,   r31),
+        ("JoyCon getters",                  bench_getters,       joycon,   r30),
+        ("JoyCon._handle_input_report",     bench_handle,        joycon,   r30),
+        ("JoyCon._handle_input_report hist", bench_handle,        history,  r31),
+        ("PythonicJoyCon.accel/gyro",       bench_pythonic_imu,  pythonic, l30),
+        ("ButtonEventJoyCon R hooks",       bench_button_events, events_r, r30),
+        ("ButtonEventJoyCon L hooks",       bench_button_events, events_l, l30),
+        ("ButtonEventJoyCon R metrics",     bench_button_events, metrics,  r30),
+        ("GyroTrackingJoyCon._gyro_update", bench_gyro_hook,     gyro,     r30),
+        ("decode_input_report",             bench_decode,        joycon,   r31),
+    ]
+    if importlib.util.find_spec("numpy") is not None:
+        benchmarks += [
+            ("PythonicJoyCon.imu_array",        bench_imu_array,       pythonic, l30),
+            ("PythonicJoyCon.imu_array batch",  bench_imu_array_batch, pythonic, l30),
+        ]
+    return benchmarks
+
+
+def bench_manager(devices, threads, report_rate=1000, seconds=2):
+    manager = JoyConManager(threads)
+    backend = functools.partial(EmulatedJoyCon, report_rate=report_rate)
+    for i in range(devices):
+        manager.connect(JOYCON_VENDOR_ID, (JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID)[i % 2],
+                        joycon_class=ButtonEventJoyCon, backend=backend)
+    manager.throughput()
+    time.sleep(seconds)
+    rate = manager.throughput()
+    manager.close()
+    print(f"JoyConManager: {devices} devices at {report_rate} Hz on {threads} thread(s): "
+          f"{rate:.0f} reports/s ({rate / (devices * report_rate):.0%} of the offered load)")
+
+
+def bench_imports(module, repeat):
+    # every run needs a fresh interpreter, the fastest one is kept
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True, check=True)
+        imports = []
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                own, cumulative, name = line[len("import time:"):].split("|")
+                if own.strip().isdigit():
+                    imports.append((name.rstrip(), int(own), int(cumulative)))
+        total = next(cumulative for name, own, cumulative in imports if name.strip() == module)
+        if best is None or total < best[0]:
+            best = total, imports
+    total, imports = best
+    print(f"import {module}: {total / 1000:.1f} ms (best of {repeat})")
+    print(f"{'module':40} {'self ms':>8} {'total ms':>9}")
+    for name, own, cumulative in sorted(imports, key=lambda i: i[2], reverse=True)[:15]:
+        print(f"{name:40} {own / 1000:8.1f} {cumulative / 1000:9.1f}")
+
+
+def measure(func, joycon, reports, repeat):
+    best = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            func(joycon, reports)
+            elapsed = (time.perf_counter_ns() - start) / len(reports)
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        gc.enable()
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default="bench_baseline.json", help="baseline file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per layer, the fastest one is kept")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--manager", type=int, metavar="DEVICES", help="measure JoyConManager throughput instead")
+    parser.add_argument("--threads", type=int, default=1, help="reader threads for --manager")
+    parser.add_argument("--imports", nargs="?", const="pyjoycon", metavar="MODULE",
+                        help="measure the import time of MODULE (default: %(const)s) instead")
+    args = parser.parse_args(argv)
+
+    if args.manager:
+        bench_manager(args.manager, args.threads)
+        return 0
+    if args.imports:
+        bench_imports(args.imports, args.repeat)
+        return 0
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'layer':34} {'ns/report':>11} {'reports/s':>12} {'baseline':>11}")
+    for name, func, joycon, reports in layers():
+        ns = measure(func, joycon, reports, args.repeat)
+        results[name] = ns
+        line = f"{name:34} {ns:11.0f} {1e9 / ns:12.0f}"
+        if name in baseline:
+            line += f" {baseline[name]:11.0f} {ns / baseline[name] - 1:+7.1%}"
+            if ns > baseline[name] * (1 + args.tolerance):
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} layer(s) regressed by more than {args.tolerance:.0%}: "
+              + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
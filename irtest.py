@@ -22,15 +22,19 @@ joycon = JoyCon(*joycon_id, ir_mode=mode, ir_registers=r)
 
 start = time()
 count = 0
+last_image = None
 
 def update(j):
-    global count,screen
+    global count, last_image
     count += 1
     for event in pygame.event.get():
         if event.type == pygame.QUIT: sys.exit()
     image = j.get_ir_image()
     clusters = j.get_ir_clusters()
     if image is not None:
+        if image is last_image:  # a new frame comes in the other buffer
+            return
+        last_image = image
         print("image")
         screen.fill((0,0,0))
         for y in range(height):
@@ -1,20 +1,24 @@
 from .joycon import JoyCon
 from .wrappers import PythonicJoyCon  # as JoyCon
-from .gyro import GyroTrackingJoyCon
-from .event import ButtonEventJoyCon
-from .ir import IRRegisters
+from .state import InputState
 from .device import get_device_ids, get_ids_of_type
 from .device import is_id_L
 from .device import get_R_ids, get_L_ids
 from .device import get_R_id, get_L_id
+import importlib
 
 __version__ = "0.2.4"
 
 __all__ = [
+    "AsyncJoyCon",
     "ButtonEventJoyCon",
+    "CalibrationCache",
     "GyroTrackingJoyCon",
+    "InputState",
     "JoyCon",
+    "JoyConManager",
     "PythonicJoyCon",
+    "connect_all",
     "get_L_id",
     "get_L_ids",
     "get_R_id",
@@ -24,3 +28,28 @@ __all__ = [
     "is_id_L",
     "IRRegisters"
 ]
+
+# imported on first access, so that tools which only need JoyCon don't pay
+# for asyncio, PyGLM and the like
+_LAZY = {
+    "AsyncJoyCon":        "aio",
+    "ButtonEventJoyCon":  "event",
+    "CalibrationCache":   "cache",
+    "GyroTrackingJoyCon": "gyro",
+    "IRRegisters":        "ir",
+    "JoyConManager":      "manager",
+    "connect_all":        "manager",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
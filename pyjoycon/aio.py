@@ -0,0 +1,116 @@
+from .joycon import JoyCon
+import asyncio
+import functools
+import threading
+
+
+class AsyncJoyCon:
+    """
+    Delivers the input reports of a JoyCon to an asyncio event loop.
+
+    If the device exposes a file descriptor the reports are read by the
+    event loop itself through `loop.add_reader`, and the update hooks run on
+    the loop. Otherwise the JoyCon's input report thread is used and each
+    report is handed over with `loop.call_soon_threadsafe`.
+
+    Any number of coroutines may wait for reports at the same time, they all
+    share a single future per report:
+
+        joycon = await AsyncJoyCon.connect(*get_R_id())
+        async for state in joycon.aiter_reports():
+            ...
+
+    A consumer which is slower than the report rate only sees the latest
+    report, use the report history of the JoyCon to get every one of them.
+
+    Construct it from a coroutine (or a callback) running on its event loop,
+    which is the running loop unless `loop` is given.
+    """
+
+    def __init__(self, joycon: JoyCon, loop=None):
+        self.joycon = joycon
+        self._loop = loop or asyncio.get_running_loop()
+        self._next_report = None
+        self._fd = None
+
+        device = joycon._joycon_device
+        if joycon._update_input_report_thread is None and hasattr(device, "fileno"):
+            self._fd = device.fileno()
+            self._loop.add_reader(self._fd, self._on_readable)
+            joycon._set_reader(threading.get_ident())  # the loop's thread
+        else:
+            joycon.register_update_hook(self._on_report_threadsafe)
+            if joycon._update_input_report_thread is None:
+                joycon._start_update_input_report_thread()
+
+    @classmethod
+    async def connect(cls, *args, joycon_class=JoyCon, **kwargs):
+        """constructs a `joycon_class(*args, **kwargs)` without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        joycon = await loop.run_in_executor(
+            None, functools.partial(joycon_class, *args, threaded=False, **kwargs))
+        return cls(joycon, loop)
+
+    def _on_readable(self):  # event loop
+        try:
+            report = self.joycon._read_input_report()
+        except (IOError, AttributeError):
+            self.close()
+            raise
+        self.joycon._handle_report(report)
+        if report[0] == 0x30 or report[0] == 0x31:
+            self._publish(self.joycon._input_state)
+
+    def _on_report_threadsafe(self, joycon):  # input report thread
+        if self._next_report is not None:  # nobody is waiting otherwise
+            self._loop.call_soon_threadsafe(self._publish, joycon._input_state)
+
+    def _publish(self, state):
+        future, self._next_report = self._next_report, None
+        if future is not None and not future.done():
+            future.set_result(state)
+
+    async def next_report(self):
+        """waits for the next input report and returns its `InputState`"""
+        if self._next_report is None:
+            self._next_report = self._loop.create_future()
+        return await asyncio.shield(self._next_report)
+
+    async def aiter_reports(self):
+        while True:
+            yield await self.next_report()
+
+    async def subcommand(self, subcommand: int, argument: bytes = b'', timeout=1.0) -> bytes:
+        """sends a subcommand and returns the 0x21 reply once its ack arrived"""
+        future = self.joycon._send_subcommand(bytes((subcommand,)), argument)
+        try:
+            report = await asyncio.wait_for(asyncio.wrap_future(future, loop=self._loop), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
+        if not report[13] & 0x80:
+            raise IOError(f"subcommand {subcommand:#04x} got NACK")
+        return report
+
+    async def set_player_lamp_on(self, on_pattern: int):
+        await self.subcommand(0x30, bytes((on_pattern & 0xF,)))
+
+    async def set_player_lamp_flashing(self, flashing_pattern: int):
+        await self.subcommand(0x30, bytes(((flashing_pattern & 0xF) << 4,)))
+
+    async def set_player_lamp(self, pattern: int):
+        await self.subcommand(0x30, bytes((pattern,)))
+
+    async def disconnect_device(self):
+        await self.subcommand(0x06, b'\x00')
+
+    def close(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        elif self._on_report_threadsafe in self.joycon._input_hooks:
+            self.joycon._input_hooks.remove(self._on_report_threadsafe)
+        if self._next_report is not None:
+            self._next_report.cancel()
+            self._next_report = None
+        self.joycon.close()
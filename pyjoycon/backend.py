@@ -0,0 +1,72 @@
+"""
+Transport backends used by `JoyCon` to talk to a device.
+
+A backend is any callable `backend(vendor_id, product_id, serial)` which
+returns an opened device object providing:
+
+ *  `read(size)`  -> up to `size` bytes of the next input report (blocking)
+ *  `write(data)` -> sends one output report
+ *  `close()`
+
+Devices may additionally provide `fileno()` if they are backed by a file
+descriptor which can be waited on with `select`.
+
+Available backends are `hid_backend`, `hidraw.hidraw_backend` (Linux only)
+and `emulator.EmulatedJoyCon`.
+"""
+import sys
+
+
+def _hid_path(hid, vendor_id, product_id, serial):
+    for device in hid.enumerate(vendor_id, product_id):
+        if device.get("serial_number") == serial:
+            return device["path"]
+    return None
+
+
+def hid_backend(vendor_id, product_id, serial=None):
+    """
+    opens a device through either the `hidapi` or the `hid` package, the
+    device with the given serial if it is found and else the first device
+    matching the ids
+    """
+    import hid
+
+    path = _hid_path(hid, vendor_id, product_id, serial) if serial else None
+    try:
+        if hasattr(hid, "device"):  # hidapi
+            device = hid.device()
+            if path is not None:
+                device.open_path(path)
+            else:
+                device.open(vendor_id, product_id, None)
+        elif hasattr(hid, "Device"):  # hid
+            if path is not None:
+                device = hid.Device(path=path)
+            else:
+                device = hid.Device(vendor_id, product_id, None)
+        else:
+            raise Exception("Implementation of hid is not recognized!")
+    except IOError as e:
+        raise IOError('joycon connect failed') from e
+    return device
+
+
+def set_nonblocking(device, nonblocking=True):
+    """makes `read` return an empty result instead of waiting for a report, or wait again"""
+    if hasattr(device, "set_nonblocking"):  # hidapi, EmulatedJoyCon
+        device.set_nonblocking(1 if nonblocking else 0)
+    else:  # hid
+        device.nonblocking = bool(nonblocking)
+
+
+def default_backend(vendor_id, product_id, serial=None):
+    """uses `hid_backend`, or `hidraw_backend` on Linux if neither hid package is installed"""
+    try:
+        import hid  # noqa: F401
+    except ImportError:
+        if not sys.platform.startswith("linux"):
+            raise
+        from .hidraw import hidraw_backend
+        return hidraw_backend(vendor_id, product_id, serial)
+    return hid_backend(vendor_id, product_id, serial)
@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import threading
+import time
+
+
+def default_cache_dir():
+    """returns the per-user cache directory of pyjoycon"""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "pyjoycon")
+
+
+def _complete(spi):
+    # every range JoyCon._read_calibration_data reads, with its full length
+    from .joycon import JoyCon
+    ranges = JoyCon._CALIBRATION_RANGES
+    if any(len(spi.get(address, b"")) != size for address, size in ranges):
+        return False
+    imu = 0x8028 if spi[0x8010][22:24] == b"\xB2\xA1" else 0x6020
+    return len(spi.get(imu, b"")) == 24
+
+
+class CalibrationCache:
+    """
+    Keeps the SPI flash ranges read when connecting a JoyCon (colors, IMU and
+    stick calibration) in a small JSON file, so that reconnecting a known
+    JoyCon only takes one device info round-trip instead of several SPI reads.
+
+    Entries are keyed by the MAC address of the JoyCon and are ignored if its
+    product id or firmware version changed, or if they are older than
+    `max_age` seconds. Call `invalidate` after recalibrating a JoyCon.
+
+        cache = CalibrationCache()
+        joycon = JoyCon(*get_R_id(), calibration_cache=cache)
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None, max_age=None):
+        self.path = path or os.path.join(default_cache_dir(), "calibration.json")
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    content = json.load(f)
+            except (OSError, ValueError):
+                content = None
+            if (not isinstance(content, dict) or content.get("version") != self.VERSION
+                    or not isinstance(content.get("entries"), dict)):
+                content = {"entries": {}}
+            self._entries = content["entries"]
+        return self._entries
+
+    def _save(self):
+        # best effort, a cache which cannot be written only costs time
+        tmp = "%s.%d.tmp" % (self.path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({"version": self.VERSION, "entries": self._entries}, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, mac, product_id, firmware):
+        """returns the cached `{address: bytes}` of a JoyCon, or None if there is no valid entry"""
+        with self._lock:
+            entry = self._load().get(mac)
+        if entry is None:
+            return None
+        # a hand-edited, truncated or outdated entry is a miss, it gets rewritten
+        try:
+            if entry["product_id"] != product_id or entry["firmware"] != firmware:
+                return None
+            if self.max_age is not None and time.time() - entry["time"] > self.max_age:
+                return None
+            spi = {int(address, 16): bytes.fromhex(data) for address, data in entry["spi"].items()}
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+        return spi if _complete(spi) else None
+
+    def put(self, mac, product_id, firmware, spi):
+        """stores the `{address: bytes}` read from a JoyCon"""
+        with self._lock:
+            self._load()[mac] = {
+                "product_id": product_id,
+                "firmware": firmware,
+                "time": time.time(),
+                "spi": {"%#06x" % address: data.hex() for address, data in spi.items()},
+            }
+            self._save()
+
+    def invalidate(self, mac=None):
+        """forgets the entry of one JoyCon, or of every JoyCon if `mac` is None"""
+        with self._lock:
+            entries = self._load()
+            if mac is None:
+                entries.clear()
+            else:
+                entries.pop(mac, None)
+            self._save()
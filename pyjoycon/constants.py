@@ -3,3 +3,13 @@ JOYCON_L_PRODUCT_ID = 0x2006
 JOYCON_R_PRODUCT_ID = 0x2007
 JOYCON_PRODUCT_IDS = (JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID)
 
+
+# bit positions in the 24 bit button field at bytes 3-5 of an input report
+BUTTON_BITS = {
+    "y": 0, "x": 1, "b": 2, "a": 3,
+    "right_sr": 4, "right_sl": 5, "r": 6, "zr": 7,
+    "minus": 8, "plus": 9, "stick_r_btn": 10, "stick_l_btn": 11,
+    "home": 12, "capture": 13, "charging_grip": 15,
+    "down": 16, "up": 17, "right": 18, "left": 19,
+    "left_sr": 20, "left_sl": 21, "l": 22, "zl": 23,
+}
@@ -1,13 +1,24 @@
-import hid
+import sys
 from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
 from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
 
 
+def _enumerate():
+    try:
+        import hid
+    except ImportError:
+        if not sys.platform.startswith("linux"):
+            raise
+        from . import hidraw
+        return hidraw.enumerate()
+    return hid.enumerate(0, 0)
+
+
 def get_device_ids(debug=False):
     """
     returns a list of tuples like `(vendor_id, product_id, serial_number)`
     """
-    devices = hid.enumerate(0, 0)
+    devices = _enumerate()
 
     out = []
     for device in devices:
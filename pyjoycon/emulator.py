@@ -0,0 +1,369 @@
+from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
+from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+from .constants import BUTTON_BITS
+from collections import deque
+import itertools
+import random
+import struct
+import threading
+import time
+
+
+_serials = itertools.count(1)
+
+_IMU_SAMPLE = struct.Struct("<6h")
+_IR_CLUSTER = struct.Struct("<8H")
+
+_IR_POINTING  = 4
+_IR_IMAGE     = 7
+_IR_FRAGMENT_SIZE = 300
+
+
+def _pack_stick(x, y):
+    return bytes((x & 0xFF, ((x >> 8) & 0x0F) | ((y & 0x0F) << 4), (y >> 4) & 0xFF))
+
+
+def _pack_stick_calibration(a, b, c):
+    return b"".join(_pack_stick(*xy) for xy in (a, b, c))
+
+
+class EmulatedJoyCon:
+    """
+    An in-process Joy-Con which answers the subcommands sent by `JoyCon`
+    and streams input reports at `report_rate` reports per second (or as
+    fast as they are read if `report_rate` is None). The class can be
+    used directly as a backend:
+
+        JoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, backend=EmulatedJoyCon)
+
+    The reported state is taken from the `buttons`, `stick_l`, `stick_r`,
+    `accel` and `gyro` attributes, which may be changed at any time or from
+    an `on_report(emulator)` callback invoked before each input report.
+    To exercise the IR retransmissions, IR_IMAGE fragments get lost with the
+    probability `ir_fragment_loss`, and input reports with the probability
+    `report_loss`. The timer byte of the reports advances by 5 ms ticks of
+    the emulated clock, over lost reports as well.
+    """
+
+    def __init__(self, vendor_id=JOYCON_VENDOR_ID, product_id=JOYCON_R_PRODUCT_ID, serial=None,
+                 report_rate=1 / 0.015, on_report=None):
+        if vendor_id != JOYCON_VENDOR_ID:
+            raise ValueError(f'vendor_id is invalid: {vendor_id!r}')
+        if product_id not in JOYCON_PRODUCT_IDS:
+            raise ValueError(f'product_id is invalid: {product_id!r}')
+
+        self.vendor_id   = vendor_id
+        self.product_id  = product_id
+        number           = next(_serials)
+        self.serial      = serial or "emulated-%04x" % number
+        self.mac_address = bytes((0x98, 0xB6, 0xE9, 0x00, (number >> 8) & 0xFF, number & 0xFF))
+        self.firmware    = (0x04, 0x06)
+        self.report_rate = report_rate
+        self.on_report   = on_report
+
+        self.buttons       = 0
+        self.stick_l       = (2048, 2048) if self.is_left() else (0, 0)
+        self.stick_r       = (0, 0) if self.is_left() else (2048, 2048)
+        self.accel         = (0, 0, 4096)
+        self.gyro          = (0, 0, 0)
+        self.battery_level = 4
+        self.charging      = False
+
+        self.ir_image    = None  # bytes-like, defaults to a test pattern
+        self.ir_clusters = []    # (brightness, pixels, cm_y_64, cm_x_64, y_start, y_end, x_start, x_end)
+        self.ir_window   = 4     # IR_IMAGE fragments sent ahead of the last acknowledged one
+        self.ir_fragment_loss = 0.0  # probability that an IR_IMAGE fragment gets lost
+        self.report_loss = 0.0       # probability that an input report gets lost
+        self.random      = random.Random(0)
+
+        self.spi_flash = bytearray(b"\xFF" * 0x80000)
+        self.spi_flash[0x6050:0x6056] = (b"\x0A\xB9\xE6\x46\x46\x46" if self.is_left()
+                                         else b"\xFF\x3C\x28\x1E\x0A\x0A")
+        self.spi_flash[0x6020:0x6038] = struct.pack(
+            "<12h", 0, 0, 0, 0x4000, 0x4000, 0x4000, 0, 0, 0, 0x343B, 0x343B, 0x343B)
+        self.spi_flash[0x603D:0x6046] = _pack_stick_calibration((1400, 1400), (2048, 2048), (1400, 1400))
+        self.spi_flash[0x6046:0x604F] = _pack_stick_calibration((2048, 2048), (1400, 1400), (1400, 1400))
+
+        self.mcu_registers = {page: bytearray(0x100) for page in range(5)}
+
+        self.rumble        = b'\x00\x01\x40\x40\x00\x01\x40\x40'  # of the last output report
+        self.vibration     = False  # enabled by subcommand 0x48, the rumble data is ignored until then
+
+        self.reports_sent  = 0
+        self.reports_lost  = 0
+        self.ir_frames_sent = 0
+
+        self._report_mode  = 0x3F
+        self._imu_enabled  = False
+        self._mcu_state    = 0x00
+        self._ir_mode      = None
+        self._ir_fragments = 1
+        self._ir_streaming = False
+        self._ir_fragment  = 0
+        self._ir_acked     = -1
+        self._ir_resend    = deque()
+        self._timer        = 0
+        self._replies      = deque()
+        self._closed       = False
+        self._nonblocking  = False
+        self._cond         = threading.Condition()
+        self._next_report  = time.monotonic()
+        self._report       = bytearray(362)
+
+    def is_left(self):
+        return self.product_id == JOYCON_L_PRODUCT_ID
+
+    def is_right(self):
+        return self.product_id == JOYCON_R_PRODUCT_ID
+
+    def press(self, *buttons):
+        for button in buttons:
+            self.buttons |= 1 << BUTTON_BITS[button]
+
+    def release(self, *buttons):
+        for button in buttons:
+            self.buttons &= ~(1 << BUTTON_BITS[button])
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def set_nonblocking(self, nonblocking):
+        self._nonblocking = bool(nonblocking)
+
+    def read(self, size, timeout_ms=0):
+        """like hidapi, returns an empty result if nothing arrived in time when non-blocking or given a timeout"""
+        if self._nonblocking:
+            timeout_ms = 0
+        elif timeout_ms <= 0:
+            timeout_ms = None
+        deadline = None if timeout_ms is None else time.monotonic() + timeout_ms / 1000
+        with self._cond:
+            while True:
+                while not self._replies:
+                    if self._closed:
+                        raise IOError("device is closed")
+                    if not self.report_rate:
+                        break
+                    now = time.monotonic()
+                    delay = self._next_report - now
+                    if delay <= 0:
+                        break
+                    if deadline is not None:
+                        if deadline <= now:
+                            return b""
+                        delay = min(delay, deadline - now)
+                    self._cond.wait(delay)
+                if self._closed:
+                    raise IOError("device is closed")
+                if self._replies:
+                    return bytes(self._replies.popleft()[:size])
+
+                now = time.monotonic()
+                if self.report_rate:
+                    period = 1 / self.report_rate
+                    self._next_report += period
+                    if self._next_report < now - period:
+                        # fell behind, like the radio we drop reports
+                        self._lose_reports(int((now - self._next_report) / period))
+                        self._next_report = now
+                if self.report_loss and self.random.random() < self.report_loss:
+                    self._lose_reports(1)
+                    continue
+                report = self._input_report()
+                return bytes(report[:size])
+
+    def write(self, data):
+        data = bytes(data)
+        with self._cond:
+            if self._closed:
+                raise IOError("device is closed")
+            if data[0] in (0x01, 0x10, 0x11) and self.vibration:
+                self.rumble = data[2:10]
+            if data[0] == 0x01:
+                self._subcommand(data[10], data[11:])
+            elif data[0] == 0x11:
+                self._mcu_request(data[10], data[11:])
+            self._cond.notify_all()
+        return len(data)
+
+    # input reports
+
+    def _report_ticks(self):
+        # 5 ms timer ticks between two input reports
+        return max(1, round(200 / self.report_rate)) if self.report_rate else 3
+
+    def _lose_reports(self, n):
+        self.reports_lost += n
+        self._timer = (self._timer + n * self._report_ticks()) & 0xFF
+
+    def _fill_standard(self, buf, report_id):
+        buf[0] = report_id
+        buf[1] = self._timer
+        buf[2] = ((self.battery_level & 0x7) << 5) | (0x10 if self.charging else 0) | 0x0E
+        buf[3] = self.buttons & 0xFF
+        buf[4] = (self.buttons >> 8) & 0xFF
+        buf[5] = (self.buttons >> 16) & 0xFF
+        buf[6:9]  = _pack_stick(*self.stick_l)
+        buf[9:12] = _pack_stick(*self.stick_r)
+        buf[12] = 0x00
+
+    def _input_report(self):
+        if self.on_report is not None:
+            self.on_report(self)
+        self.reports_sent += 1
+
+        if self._report_mode not in (0x30, 0x31):
+            buf = bytearray(12)
+            buf[0] = 0x3F
+            buf[1] = self.buttons & 0xFF
+            buf[2] = (self.buttons >> 8) & 0xFF
+            buf[3] = 0x08
+            return buf
+
+        buf = self._report
+        self._timer = (self._timer + self._report_ticks()) & 0xFF
+        self._fill_standard(buf, self._report_mode)
+        if self._imu_enabled:
+            for i in range(3):
+                _IMU_SAMPLE.pack_into(buf, 13 + 12 * i, *self.accel, *self.gyro)
+        else:
+            buf[13:49] = bytes(36)
+        if self._report_mode == 0x30:
+            return buf[:49]
+
+        buf[49:] = bytes(len(buf) - 49)
+        if self._ir_streaming:
+            self._fill_ir(buf)
+        else:
+            buf[49] = 0xFF
+        return buf
+
+    def _fill_ir(self, buf):
+        buf[49] = 0x03
+        buf[51] = self._ir_mode
+        if self._ir_mode == _IR_IMAGE:
+            if self.ir_image is None:
+                size = self._ir_fragments * _IR_FRAGMENT_SIZE
+                self.ir_image = bytes(i * 7 & 0xFF for i in range(size))
+            f = self._next_ir_fragment()
+            if self.random.random() < self.ir_fragment_loss:
+                buf[49] = 0xFF
+                return
+            buf[52] = f
+            offset = f * _IR_FRAGMENT_SIZE
+            buf[59:59 + _IR_FRAGMENT_SIZE] = self.ir_image[offset:offset + _IR_FRAGMENT_SIZE]
+        else:
+            buf[52] = 0
+            i = 61
+            for cluster in self.ir_clusters:
+                if self._ir_mode == _IR_POINTING and i - 61 in (48, 97, 146, 195, 244):
+                    i += 1
+                if i + 16 > 59 + _IR_FRAGMENT_SIZE:
+                    break
+                _IR_CLUSTER.pack_into(buf, i, *cluster)
+                i += 16
+
+    def _next_ir_fragment(self):
+        if self._ir_resend:
+            return self._ir_resend.popleft()
+        f = self._ir_fragment
+        if f >= self._ir_fragments or f > self._ir_acked + self.ir_window:
+            return max(f - 1, 0)  # waits for an ack, repeating the previous fragment
+        self._ir_fragment += 1
+        return f
+
+    def _reply(self, subcommand, ack, data=b""):
+        buf = bytearray(49)
+        self._fill_standard(buf, 0x21)
+        buf[13] = ack
+        buf[14] = subcommand
+        buf[15:15 + len(data)] = data
+        self._replies.append(buf)
+
+    def _mcu_reply(self, data):
+        buf = bytearray(362)
+        self._fill_standard(buf, self._report_mode if self._report_mode == 0x31 else 0x31)
+        buf[49:49 + len(data)] = data
+        self._replies.append(buf)
+
+    # output reports
+
+    def _subcommand(self, subcommand, args):
+        if subcommand == 0x10:  # SPI flash read
+            address, size = struct.unpack_from("<IB", args)
+            self._reply(subcommand, 0x90, bytes(args[:5]) + self.spi_flash[address:address + size])
+        elif subcommand == 0x02:  # device info
+            info = bytes(self.firmware) + bytes((1 if self.is_left() else 2, 0x02)) + self.mac_address + b"\x01\x01"
+            self._reply(subcommand, 0x82, info)
+        elif subcommand == 0x03:  # set input report mode
+            self._report_mode = args[0]
+            self._reply(subcommand, 0x80)
+        elif subcommand == 0x40:  # enable IMU
+            self._imu_enabled = bool(args[0])
+            self._reply(subcommand, 0x80)
+        elif subcommand == 0x48:  # enable vibration
+            self.vibration = bool(args[0])
+            self._reply(subcommand, 0x80)
+        elif subcommand == 0x22:  # MCU resume/suspend
+            self._mcu_state = 0x01 if args[0] else 0x00
+            if not args[0]:
+                self._ir_mode = None
+                self._ir_streaming = False
+            self._reply(subcommand, 0x80)
+        elif subcommand == 0x21:  # MCU configuration
+            self._mcu_config(args)
+        else:  # player lights, disconnect, ...
+            self._reply(subcommand, 0x80)
+
+    def _mcu_config(self, args):
+        if args[0] == 0x01:  # set MCU mode
+            self._mcu_state = args[2]
+            self._reply(0x21, 0xA0, b"\x01\x00\xFF\x00\x08\x00\x1B\x01")
+        elif args[0] == 0x23 and args[1] == 0x01:  # set IR mode
+            if args[2] in (0x00, 0x02):
+                self._ir_mode = None
+                self._ir_streaming = False
+            else:
+                self._ir_mode = args[2]
+                self._ir_fragments = args[3] + 1
+                self._ir_fragment = 0
+                self._ir_streaming = False
+                self.ir_image = None
+            self._reply(0x21, 0xA0, b"\x0B")
+        elif args[0] == 0x23 and args[1] == 0x04:  # write IR registers
+            for i in range(args[2]):
+                page, reg, value = args[3 + 3 * i:6 + 3 * i]
+                self.mcu_registers.setdefault(page, bytearray(0x100))[reg] = value
+            self._reply(0x21, 0xA0, b"\x13")
+        else:
+            self._reply(0x21, 0xA0)
+
+    def _mcu_request(self, request, args):
+        if request == 0x01:  # MCU status
+            status = bytearray(8)
+            status[0] = 0x01
+            status[7] = self._mcu_state
+            self._mcu_reply(status)
+        elif request == 0x03 and args[0] == 0x03:  # read IR registers
+            page, count = args[2], args[4]
+            registers = self.mcu_registers.setdefault(page, bytearray(0x100))
+            self._mcu_reply(bytes((0x1B, 0x01, page, 0x00, count)) + registers[:count])
+        elif request == 0x03 and args[0] == 0x00 and self._ir_mode is not None:  # IR data ack
+            if args[1] == 0x01:  # request of a missed fragment
+                self._ir_resend.append(args[2])
+            ack = args[3]
+            if not self._ir_streaming:
+                self._ir_streaming = True
+                self._ir_fragment  = 0
+                self._ir_acked     = -1
+            elif self._ir_mode != _IR_IMAGE:
+                self.ir_frames_sent += 1
+            elif ack == self._ir_fragments - 1 and self._ir_fragment >= self._ir_fragments:
+                self.ir_frames_sent += 1
+                self._ir_fragment = 0
+                self._ir_acked    = -1
+                self._ir_resend.clear()
+            else:
+                self._ir_acked = ack
@@ -1,133 +1,99 @@
 from .wrappers import PythonicJoyCon
+from .constants import BUTTON_BITS
+from collections import deque, namedtuple
+
+ButtonEvent = namedtuple("ButtonEvent", ["button", "state", "timestamp", "seq"])
+
+_BIT_NAMES = {bit: name for name, bit in BUTTON_BITS.items()}
+
+_RIGHT_BUTTONS = ("r", "zr", "plus", "a", "b", "x", "y", "home", "right_sr", "right_sl")
+_LEFT_BUTTONS  = ("l", "zl", "minus", "up", "down", "left", "right", "capture", "left_sr", "left_sl")
+
+
+def _mask(names):
+    mask = 0
+    for name in names:
+        mask |= 1 << BUTTON_BITS[name]
+    return mask
 
 
 class ButtonEventJoyCon(PythonicJoyCon):
-    def __init__(self, *args, track_sticks=False, **kwargs):
+    """
+    Tracks the buttons of the JoyCon and queues an event for every change.
+    With `track_sticks` the stick button is tracked too, and moving the stick
+    queues a `("stick_l", (x, y))` or `("stick_r", (x, y))` event with the
+    calibrated position whenever it changes. At most `max_events` events are
+    kept, when more are queued the oldest ones are dropped and counted in
+    `events_dropped`.
+    """
+
+    def __init__(self, *args, track_sticks=False, max_events=1024, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self._events_buffer = []  # TODO: perhaps use a deque instead?
+        self._events_buffer = deque(maxlen=max_events)
+        self.events_dropped = 0
 
         self._event_handlers = {}
         self._event_track_sticks = track_sticks
 
-        self._previous_stick_l_btn = 0
-        self._previous_stick_r_btn = 0
-        self._previous_stick_r  = self._previous_stick_l  = (0, 0)
-        self._previous_r        = self._previous_l        = 0
-        self._previous_zr       = self._previous_zl       = 0
-        self._previous_plus     = self._previous_minus    = 0
-        self._previous_a        = self._previous_right    = 0
-        self._previous_b        = self._previous_down     = 0
-        self._previous_x        = self._previous_up       = 0
-        self._previous_y        = self._previous_left     = 0
-        self._previous_home     = self._previous_capture  = 0
-        self._previous_right_sr = self._previous_left_sr  = 0
-        self._previous_right_sl = self._previous_left_sl  = 0
-
         if self.is_left():
-            self.register_update_hook(self._event_tracking_update_hook_left)
+            buttons = _LEFT_BUTTONS + (("stick_l_btn",) if track_sticks else ())
         else:
-            self.register_update_hook(self._event_tracking_update_hook_right)
+            buttons = _RIGHT_BUTTONS + (("stick_r_btn",) if track_sticks else ())
+        self._event_mask = _mask(buttons)
+        self._previous_buttons = 0
+        self._event_time = None
+        self._event_seq  = 0
+        self._previous_stick_raw = None
+        self._previous_stick     = (0.0, 0.0)
+
+        self.register_update_hook(self._event_tracking_update_hook)
+        if track_sticks:
+            self.register_update_hook(self._stick_tracking_update_hook)
 
     def joycon_button_event(self, button, state):  # overridable
-        self._events_buffer.append((button, state))
+        events = self._events_buffer
+        if len(events) == events.maxlen:
+            self.events_dropped += 1
+        events.append(ButtonEvent(button, state, self._event_time, self._event_seq))
 
-    def events(self):
-        while self._events_buffer:
-            yield self._events_buffer.pop(0)
+    def events(self, detailed=False):
+        """
+        yields the queued events as `(button, state)`, or as `ButtonEvent`s
+        with the receive time and the `seq` of the report they came with if
+        `detailed`, as in its `InputState`
+        """
+        events = self._events_buffer
+        while events:
+            event = events.popleft()
+            yield event if detailed else event[:2]
 
     @staticmethod
-    def _event_tracking_update_hook_right(self):
-        if self._event_track_sticks:
-            pressed = self.stick_r_btn
-            if self._previous_stick_r_btn != pressed:
-                self._previous_stick_r_btn = pressed
-                self.joycon_button_event("stick_r_btn", pressed)
-        pressed = self.r
-        if self._previous_r != pressed:
-            self._previous_r = pressed
-            self.joycon_button_event("r", pressed)
-        pressed = self.zr
-        if self._previous_zr != pressed:
-            self._previous_zr = pressed
-            self.joycon_button_event("zr", pressed)
-        pressed = self.plus
-        if self._previous_plus != pressed:
-            self._previous_plus = pressed
-            self.joycon_button_event("plus", pressed)
-        pressed = self.a
-        if self._previous_a != pressed:
-            self._previous_a = pressed
-            self.joycon_button_event("a", pressed)
-        pressed = self.b
-        if self._previous_b != pressed:
-            self._previous_b = pressed
-            self.joycon_button_event("b", pressed)
-        pressed = self.x
-        if self._previous_x != pressed:
-            self._previous_x = pressed
-            self.joycon_button_event("x", pressed)
-        pressed = self.y
-        if self._previous_y != pressed:
-            self._previous_y = pressed
-            self.joycon_button_event("y", pressed)
-        pressed = self.home
-        if self._previous_home != pressed:
-            self._previous_home = pressed
-            self.joycon_button_event("home", pressed)
-        pressed = self.right_sr
-        if self._previous_right_sr != pressed:
-            self._previous_right_sr = pressed
-            self.joycon_button_event("right_sr", pressed)
-        pressed = self.right_sl
-        if self._previous_right_sl != pressed:
-            self._previous_right_sl = pressed
-            self.joycon_button_event("right_sl", pressed)
+    def _event_tracking_update_hook(self):
+        state = self._input_state
+        buttons = state.buttons & self._event_mask
+        changed = buttons ^ self._previous_buttons
+        if not changed:
+            return
+        self._previous_buttons = buttons
+        self._event_time = state.received
+        self._event_seq  = state.seq
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            self.joycon_button_event(_BIT_NAMES[bit.bit_length() - 1], 1 if buttons & bit else 0)
 
     @staticmethod
-    def _event_tracking_update_hook_left(self):
-        if self._event_track_sticks:
-            pressed = self.stick_l_btn
-            if self._previous_stick_l_btn != pressed:
-                self._previous_stick_l_btn = pressed
-                self.joycon_button_event("stick_l_btn", pressed)
-        pressed = self.l
-        if self._previous_l != pressed:
-            self._previous_l = pressed
-            self.joycon_button_event("l", pressed)
-        pressed = self.zl
-        if self._previous_zl != pressed:
-            self._previous_zl = pressed
-            self.joycon_button_event("zl", pressed)
-        pressed = self.minus
-        if self._previous_minus != pressed:
-            self._previous_minus = pressed
-            self.joycon_button_event("minus", pressed)
-        pressed = self.up
-        if self._previous_up != pressed:
-            self._previous_up = pressed
-            self.joycon_button_event("up", pressed)
-        pressed = self.down
-        if self._previous_down != pressed:
-            self._previous_down = pressed
-            self.joycon_button_event("down", pressed)
-        pressed = self.left
-        if self._previous_left != pressed:
-            self._previous_left = pressed
-            self.joycon_button_event("left", pressed)
-        pressed = self.right
-        if self._previous_right != pressed:
-            self._previous_right = pressed
-            self.joycon_button_event("right", pressed)
-        pressed = self.capture
-        if self._previous_capture != pressed:
-            self._previous_capture = pressed
-            self.joycon_button_event("capture", pressed)
-        pressed = self.left_sr
-        if self._previous_left_sr != pressed:
-            self._previous_left_sr = pressed
-            self.joycon_button_event("left_sr", pressed)
-        pressed = self.left_sl
-        if self._previous_left_sl != pressed:
-            self._previous_left_sl = pressed
-            self.joycon_button_event("left_sl", pressed)
+    def _stick_tracking_update_hook(self):
+        state = self._input_state
+        left = self.is_left()
+        raw = state.stick_l if left else state.stick_r
+        if raw == self._previous_stick_raw:
+            return
+        self._previous_stick_raw = raw
+        position = self.stick_of(state, left)
+        if position != self._previous_stick:
+            self._previous_stick = position
+            self._event_time = state.received
+            self._event_seq  = state.seq
+            self.joycon_button_event("stick_l" if left else "stick_r", position)
@@ -0,0 +1,129 @@
+"""
+Orientation fusion of the IMU samples.
+
+`MahonyFilter` integrates the gyroscope over the real sample spacing of the
+JoyCon (three samples 5 ms apart per report) and pulls the estimate towards
+the gravity measured by the accelerometer, which keeps the tilt from
+drifting. While the JoyCon lies still the gyroscope bias is learned as well,
+which keeps the heading from drifting over long sessions.
+
+Orientations are `(w, x, y, z)` tuples rotating the JoyCon frame into a world
+frame whose z axis points up.
+"""
+from .timing import TICK as SAMPLE_PERIOD  # seconds between two IMU samples
+from math import sqrt, sin, cos
+
+
+def _tilt(ax, ay, az):
+    # the shortest rotation taking the measured up vector onto the world z axis
+    n = sqrt(ax * ax + ay * ay + az * az)
+    w = 1.0 + az / n
+    if w < 1e-6:  # upside down
+        return (0.0, 1.0, 0.0, 0.0)
+    x, y = ay / n, -ax / n
+    k = 1.0 / sqrt(w * w + x * x + y * y)
+    return (w * k, x * k, y * k, 0.0)
+
+
+class MahonyFilter:
+    """
+    A complementary (Mahony) filter. `kp` is the gain pulling the tilt towards
+    the accelerometer, `ki` the gain of the gyroscope bias correction. The
+    accelerometer is ignored while its magnitude is off from 1 g by more than
+    `accel_tolerance` (the JoyCon is being swung); the bias is learned with
+    the time constant `bias_time` while the gyroscope reads less than
+    `rest_rate` rad/s.
+    """
+
+    def __init__(self, kp=0.5, ki=0.005, accel_tolerance=0.15, rest_rate=0.05, bias_time=5.0):
+        self.kp = kp
+        self.ki = ki
+        self.accel_tolerance = accel_tolerance
+        self.rest_rate = rest_rate
+        self.bias_time = bias_time
+        self.bias = (0.0, 0.0, 0.0)  # rad/s
+        self.q = None  # set from the first accelerometer reading
+
+    def reset(self):
+        """forgets the orientation, keeping the learned bias"""
+        self.q = None
+
+    def update(self, ax, ay, az, gx, gy, gz, dt=SAMPLE_PERIOD):
+        """
+        advances the orientation by `dt` seconds, given an IMU sample: the
+        acceleration in g and the angular rate in rad/s, and returns it
+        """
+        q = self.q
+        n2 = ax * ax + ay * ay + az * az
+        if q is None:
+            if not n2:
+                return None
+            q = _tilt(ax, ay, az)
+        w, x, y, z = q
+        bx, by, bz = self.bias
+        gx -= bx
+        gy -= by
+        gz -= bz
+
+        if abs(n2 - 1.0) < 2.0 * self.accel_tolerance:
+            rest = gx * gx + gy * gy + gz * gz < self.rest_rate * self.rest_rate
+            n = 1.0 / sqrt(n2)
+            ax *= n
+            ay *= n
+            az *= n
+            # the error between the measured and the estimated up vector
+            vx = 2.0 * (x * z - w * y)
+            vy = 2.0 * (w * x + y * z)
+            vz = w * w - x * x - y * y + z * z
+            ex = ay * vz - az * vy
+            ey = az * vx - ax * vz
+            ez = ax * vy - ay * vx
+            ki = self.ki * dt
+            bx -= ki * ex
+            by -= ki * ey
+            bz -= ki * ez
+            if rest:
+                k = min(dt / self.bias_time, 1.0)
+                bx += k * gx
+                by += k * gy
+                bz += k * gz
+            self.bias = (bx, by, bz)
+            kp = self.kp
+            gx += kp * ex
+            gy += kp * ey
+            gz += kp * ez
+
+        # q * exp(omega * dt / 2)
+        rate = sqrt(gx * gx + gy * gy + gz * gz)
+        if rate:
+            half = 0.5 * rate * dt
+            c = cos(half)
+            s = sin(half) / rate
+            gx *= s
+            gy *= s
+            gz *= s
+            w, x, y, z = (
+                w * c - x * gx - y * gy - z * gz,
+                x * c + w * gx + y * gz - z * gy,
+                y * c + w * gy - x * gz + z * gx,
+                z * c + w * gz + x * gy - y * gx,
+            )
+            n = 1.0 / sqrt(w * w + x * x + y * y + z * z)
+            q = (w * n, x * n, y * n, z * n)
+        self.q = q
+        return q
+
+    def update_many(self, samples, dt=SAMPLE_PERIOD):
+        """
+        runs `update` for each `(ax, ay, az, gx, gy, gz)` of `samples`, `dt`
+        apart, or with `dt` a sequence, each the given time after the previous
+        """
+        update = self.update
+        q = self.q
+        if isinstance(dt, (int, float)):
+            for ax, ay, az, gx, gy, gz in samples:
+                q = update(ax, ay, az, gx, gy, gz, dt)
+        else:
+            for (ax, ay, az, gx, gy, gz), dt in zip(samples, dt):
+                q = update(ax, ay, az, gx, gy, gz, dt)
+        return q
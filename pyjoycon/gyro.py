@@ -1,6 +1,14 @@
 from .wrappers import PythonicJoyCon
-from glm import vec2, vec3, quat, angleAxis, eulerAngles
+from . import imu
+from .fusion import MahonyFilter
+from .timing import TICK
+try:
+    from glm import vec2, vec3, quat, eulerAngles
+except ImportError:
+    from .vector import vec2, vec3, quat, eulerAngles
 from typing import Optional
+from math import pi
+import threading
 import time
 
 
@@ -10,9 +18,25 @@ class GyroTrackingJoyCon(PythonicJoyCon):
     and deduces the current rotation of the JoyCon. Can be used to create a
     pointer rotate an object or pointin a direction. Comes with the need to be
     calibrated.
+
+    The orientation is fused from the gyroscope and the accelerometer by a
+    `fusion.MahonyFilter`, one step per IMU sample, 5 ms apart on the device
+    clock; the first sample of a report also covers dropped reports. With
+    `lazy` (requires a `history` and NumPy) nothing is done per report, the
+    reports received since the last access are fused as one batch when the
+    orientation is read.
     """
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, fusion=None, lazy=False, **kwargs):
         super().__init__(*args, simple_mode=False, **kwargs)
+        if lazy and self.history is None:
+            raise ValueError("lazy tracking needs a report history")
+
+        self.fusion = fusion or MahonyFilter()
+        self._lazy = lazy
+        self._fusion_lock = threading.Lock()
+        self._history_cursor = self.history.count if lazy else 0
+        self._last_timer = None      # of the last fused report, when lazy
+        self._last_timestamp = None  # of the last fused report, otherwise
 
         # set internal state:
         self.reset_orientation()
@@ -35,6 +59,26 @@ class GyroTrackingJoyCon(PythonicJoyCon):
     def rotation(self) -> vec3:
         return -eulerAngles(self.direction_Q)
 
+    @property
+    def direction_X(self) -> vec3:
+        w, x, y, z = self._orientation()
+        return vec3(1 - 2 * (y * y + z * z), 2 * (x * y + w * z), 2 * (x * z - w * y))
+
+    @property
+    def direction_Y(self) -> vec3:
+        w, x, y, z = self._orientation()
+        return vec3(2 * (x * y - w * z), 1 - 2 * (x * x + z * z), 2 * (y * z + w * x))
+
+    @property
+    def direction_Z(self) -> vec3:
+        w, x, y, z = self._orientation()
+        return vec3(2 * (x * z + w * y), 2 * (y * z - w * x), 1 - 2 * (x * x + y * y))
+
+    @property
+    def direction_Q(self) -> quat:
+        w, x, y, z = self._orientation()
+        return quat(w, -x, -y, -z)
+
     is_calibrating = False
 
     def calibrate(self, seconds=2):
@@ -54,12 +98,78 @@ class GyroTrackingJoyCon(PythonicJoyCon):
                 )
         self.is_calibrating = False
         self.set_gyro_calibration(gyro_offset)
+        self.fusion.bias = (0.0, 0.0, 0.0)
 
     def reset_orientation(self):
-        self.direction_X = vec3(1, 0, 0)
-        self.direction_Y = vec3(0, 1, 0)
-        self.direction_Z = vec3(0, 0, 1)
-        self.direction_Q = quat()
+        """makes the current orientation of the JoyCon the reference one"""
+        with self._fusion_lock:
+            if self._lazy:
+                self._catch_up()
+            self._reference = self._conjugate(self.fusion.q)
+
+    @staticmethod
+    def _conjugate(q):
+        if q is None:
+            return None  # the first orientation becomes the reference
+        w, x, y, z = q
+        return (w, -x, -y, -z)
+
+    def _fusion_scale(self):
+        # offsets and coefficients turning the raw samples into g and rad/s
+        a = self._ACCEL_UNITS["g"]
+        g = self._GYRO_UNITS["deg"] * pi / 180
+        c = self._ime_yz_coeff
+        scale = self._imu_calibration["fusion"] = (
+            self._ACCEL_OFFSET_X, self._ACCEL_OFFSET_Y, self._ACCEL_OFFSET_Z,
+            self._GYRO_OFFSET_X,  self._GYRO_OFFSET_Y,  self._GYRO_OFFSET_Z,
+            self._ACCEL_COEFF_X * a, self._ACCEL_COEFF_Y * a * c, self._ACCEL_COEFF_Z * a * c,
+            self._GYRO_COEFF_X * g,  self._GYRO_COEFF_Y * g * c,  self._GYRO_COEFF_Z * g * c,
+        )
+        return scale
+
+    def _catch_up(self):
+        # fuses the reports received since the last call in one batch
+        cursor, reports, _ = self.history.read_since(self._history_cursor)
+        self._history_cursor = cursor
+        if len(reports):
+            samples = self.imu_array(reports, accel_unit="g", gyro_unit="deg").reshape(-1, 6)
+            samples[:, 3:] *= pi / 180
+            samples = samples.tolist()
+            dts = self._sample_dts(reports)
+            if self._reference is None:
+                # the orientation after the first report, as when not lazy
+                self._reference = self._conjugate(self.fusion.update_many(samples[:3], dts[:3]))
+                samples, dts = samples[3:], dts[3:]
+            self.fusion.update_many(samples, dts)
+
+    def _sample_dts(self, reports):
+        # the device clock time before each sample, from the timer bytes
+        np = imu.np
+        timers = np.asarray(reports)[:, 1].astype(int)
+        previous = timers[0] - 3 if self._last_timer is None else self._last_timer
+        self._last_timer = int(timers[-1])
+        dts = np.full((len(timers), 3), TICK)
+        dts[:, 0] = np.maximum((np.diff(timers, prepend=previous) & 0xFF) * TICK - 2 * TICK, 0.0)
+        return dts.ravel().tolist()
+
+    def _orientation(self):
+        # the orientation relative to the reference one
+        with self._fusion_lock:
+            if self._lazy:
+                self._catch_up()
+            q = self.fusion.q
+            if q is None:
+                return (1.0, 0.0, 0.0, 0.0)
+            if self._reference is None:
+                self._reference = self._conjugate(q)
+            rw, rx, ry, rz = self._reference
+        w, x, y, z = q
+        return (
+            rw * w - rx * x - ry * y - rz * z,
+            rw * x + rx * w + ry * z - rz * y,
+            rw * y - rx * z + ry * w + rz * x,
+            rw * z + rx * y - ry * x + rz * w,
+        )
 
     @staticmethod
     def _gyro_update_hook(self):
@@ -70,15 +180,25 @@ class GyroTrackingJoyCon(PythonicJoyCon):
                 for xyz in self.gyro:
                     self.calibration_acumulator += xyz
                 self.calibration_acumulations += 3
+        if self._lazy:
+            return
 
-        for gx, gy, gz in self.gyro_in_rad:
-            # TODO: find out why 1/86 works, and not 1/60 or 1/(60*30)
-            rotation \
-                = angleAxis(gx * (-1/86), self.direction_X) \
-                * angleAxis(gy * (-1/86), self.direction_Y) \
-                * angleAxis(gz * (-1/86), self.direction_Z)
-
-            self.direction_X *= rotation
-            self.direction_Y *= rotation
-            self.direction_Z *= rotation
-            self.direction_Q *= rotation
+        oax, oay, oaz, ogx, ogy, ogz, kax, kay, kaz, kgx, kgy, kgz \
+            = self._imu_calibration.get("fusion") or self._fusion_scale()
+        state = self._input_state
+        (ax0, ay0, az0), (ax1, ay1, az1), (ax2, ay2, az2) = state.accel
+        (gx0, gy0, gz0), (gx1, gy1, gz1), (gx2, gy2, gz2) = state.gyro
+        t = state.timestamp
+        last, self._last_timestamp = self._last_timestamp, t
+        # the first sample comes after the last one of the previous report
+        dt = TICK if last is None or t is None else max(t - last - 2 * TICK, 0.0)
+        # the input report thread is the only one updating the filter unless lazy
+        update = self.fusion.update
+        update((ax0 - oax) * kax, (ay0 - oay) * kay, (az0 - oaz) * kaz,
+               (gx0 - ogx) * kgx, (gy0 - ogy) * kgy, (gz0 - ogz) * kgz, dt)
+        update((ax1 - oax) * kax, (ay1 - oay) * kay, (az1 - oaz) * kaz,
+               (gx1 - ogx) * kgx, (gy1 - ogy) * kgy, (gz1 - ogz) * kgz, TICK)
+        q = update((ax2 - oax) * kax, (ay2 - oay) * kay, (az2 - oaz) * kaz,
+                   (gx2 - ogx) * kgx, (gy2 - ogy) * kgy, (gz2 - ogz) * kgz, TICK)
+        if self._reference is None:
+            self._reference = self._conjugate(q)
@@ -0,0 +1,102 @@
+"""
+A backend talking to the Linux hidraw driver directly, without hidapi.
+
+Devices are discovered through sysfs, and every report is a single `read`
+of the `/dev/hidrawN` file descriptor, which is also exposed through
+`fileno()` so the device can be waited on with `select`/`epoll`.
+"""
+import glob
+import os
+
+SYSFS_ROOT = "/sys/class/hidraw"
+DEV_ROOT = "/dev"
+
+
+def _uevent(path):
+    out = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.rstrip("\n").partition("=")
+            out[key] = value
+    return out
+
+
+def enumerate(sysfs_root=SYSFS_ROOT, dev_root=DEV_ROOT):
+    """
+    returns a list of dicts like the ones of `hid.enumerate`, with the keys
+    `path`, `vendor_id`, `product_id`, `product_string` and `serial_number`
+    """
+    out = []
+    for node in sorted(glob.glob(os.path.join(sysfs_root, "hidraw*"))):
+        try:
+            uevent = _uevent(os.path.join(node, "device", "uevent"))
+            _bus, vendor_id, product_id = uevent["HID_ID"].split(":")
+        except (OSError, KeyError, ValueError):
+            continue
+        out.append({
+            "path": os.path.join(dev_root, os.path.basename(node)),
+            "vendor_id": int(vendor_id, 16),
+            "product_id": int(product_id, 16),
+            "product_string": uevent.get("HID_NAME", ""),
+            "serial_number": uevent.get("HID_UNIQ", ""),
+        })
+    return out
+
+
+class HidrawDevice:
+    """
+    An opened hidraw device. `path` may also be an already opened file
+    descriptor, such as one end of a socketpair standing in for a device.
+    """
+
+    def __init__(self, path):
+        if isinstance(path, int):
+            self._fd = path
+        else:
+            try:
+                self._fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+            except OSError as e:
+                raise IOError('joycon connect failed') from e
+
+    def fileno(self):
+        return self._fd
+
+    def set_nonblocking(self, nonblocking):
+        os.set_blocking(self._fd, not nonblocking)
+
+    def read(self, size, timeout_ms=0):
+        """returns the next report as `bytes`, or an empty result if non-blocking and none is ready"""
+        try:
+            return os.read(self._fd, size)
+        except BlockingIOError:
+            return b""
+
+    def readinto(self, buffer):
+        """reads the next report into a preallocated buffer and returns its size"""
+        try:
+            return os.readv(self._fd, (buffer,))
+        except BlockingIOError:
+            return 0
+
+    def write(self, data):
+        return os.write(self._fd, data)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _normalize_serial(serial):
+    return serial.replace(":", "").lower()
+
+
+def hidraw_backend(vendor_id, product_id, serial=None, sysfs_root=SYSFS_ROOT, dev_root=DEV_ROOT):
+    """opens the first hidraw device with the given ids (and serial, if given)"""
+    for device in enumerate(sysfs_root, dev_root):
+        if device["vendor_id"] != vendor_id or device["product_id"] != product_id:
+            continue
+        if serial and _normalize_serial(device["serial_number"]) != _normalize_serial(serial):
+            continue
+        return HidrawDevice(device["path"])
+    raise IOError('joycon connect failed: no matching hidraw device')
@@ -0,0 +1,84 @@
+from array import array
+import time
+
+
+class ReportHistory:
+    """
+    A preallocated ring buffer of the last `capacity` raw input reports and
+    their monotonic receive timestamps.
+
+    There is a single writer (the input report thread) and no locking:
+    `count` is only advanced after a report has been stored, so readers
+    never see a partially written report. Every report is stored twice,
+    `capacity` slots apart, which keeps any window of up to `capacity`
+    consecutive reports contiguous so it can be returned as a zero-copy
+    view. Views stay valid until `capacity` further reports are appended;
+    `read_since` skips ahead over reports which have already been lost.
+
+    Report views are 2D `memoryview`s of shape `(n, report_size)` and can be
+    wrapped without copying by `numpy.asarray`, timestamp views are 1D
+    `memoryview`s of doubles.
+    """
+
+    def __init__(self, capacity=1024, report_size=360):
+        if capacity <= 0:
+            raise ValueError(f'capacity is invalid: {capacity!r}')
+        self.capacity    = capacity
+        self.report_size = report_size
+        self.count       = 0  # reports appended so far, the cursor of the next one
+
+        self._reports    = memoryview(bytearray(2 * capacity * report_size))
+        self._timestamps = memoryview(array("d", bytes(16 * capacity)))
+        self._zeros      = memoryview(bytes(report_size))
+
+    def append(self, report, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        size = self.report_size
+        n = len(report)
+        if n > size:
+            report = memoryview(report)[:size]
+            n = size
+        slot = self.count % self.capacity
+        for offset in (slot * size, (slot + self.capacity) * size):
+            self._reports[offset:offset + n] = report
+            if n < size:
+                self._reports[offset + n:offset + size] = self._zeros[n:]
+        self._timestamps[slot] = self._timestamps[slot + self.capacity] = timestamp
+        self.count += 1
+
+    def _window(self, start, end):
+        slot = start % self.capacity
+        n = end - start
+        size = self.report_size
+        reports = self._reports[slot * size:(slot + n) * size]
+        if n:  # memoryviews can't have a zero length dimension
+            reports = reports.cast("B", (n, size))
+        return reports, self._timestamps[slot:slot + n]
+
+    def latest(self, n=1):
+        """returns views of the last `n` reports and their timestamps, oldest first"""
+        end = self.count
+        start = max(end - min(n, self.capacity), 0)
+        return self._window(start, end)
+
+    def read_since(self, cursor):
+        """
+        returns `(cursor, reports, timestamps)` with views of every report
+        appended since `cursor` (a previously returned cursor, or 0), and the
+        cursor to pass to the next call
+        """
+        end = self.count
+        start = max(cursor, end - self.capacity, 0)
+        return (end,) + self._window(start, end)
+
+    def lost_since(self, cursor):
+        """returns how many reports after `cursor` have already been overwritten"""
+        return max(self.count - self.capacity - cursor, 0)
+
+    def report(self, index):
+        """returns a view of the report with the absolute index `index` if it is still stored"""
+        if not self.count - self.capacity <= index < self.count or index < 0:
+            raise IndexError('report is no longer stored')
+        offset = (index % self.capacity) * self.report_size
+        return self._reports[offset:offset + self.report_size]
@@ -0,0 +1,59 @@
+"""
+Vectorized IMU decoding and calibration. Requires NumPy.
+
+The three IMU samples of a report are laid out as 3 x (accel xyz, gyro xyz)
+little endian int16 values at bytes 13-48, which maps directly onto a
+`(3, 6)` int16 array.
+"""
+np = None  # imported on first use, importing it takes longer than the whole package
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required for the vectorized IMU functions") from None
+        np = numpy
+
+
+def raw_imu(reports):
+    """
+    returns the raw IMU samples as int16 array of shape `(3, 6)` for a single
+    report, or `(n, 3, 6)` for a sequence of reports or a `(n, size)` uint8
+    array of reports. Single reports and arrays of contiguous rows are not
+    copied.
+    """
+    _require_numpy()
+    if isinstance(reports, memoryview) and reports.ndim == 2:  # see ReportHistory
+        reports = np.asarray(reports)
+    if isinstance(reports, (bytes, bytearray, memoryview)):
+        return np.frombuffer(reports, dtype="<i2", count=18, offset=13).reshape(3, 6)
+    if isinstance(reports, np.ndarray):
+        if reports.ndim == 1:
+            return raw_imu(reports.data if reports.flags.c_contiguous else reports.tobytes())
+        if reports.ndim == 2 and reports.dtype == np.uint8 and reports.strides[1] == 1:
+            # also a view for strided reports, like those of a recording
+            return reports[:, 13:49].view("<i2").reshape(-1, 3, 6)
+    return np.frombuffer(b"".join(bytes(r[13:49]) for r in reports), dtype="<i2").reshape(-1, 3, 6)
+
+
+def imu_scale(offset, coeff):
+    """
+    returns `offset` and `coeff`, given per axis in `(ax, ay, az, gx, gy, gz)`
+    order, as the float32 vectors expected by `calibrate_imu`
+    """
+    _require_numpy()
+    return np.asarray(offset, dtype=np.float32), np.asarray(coeff, dtype=np.float32)
+
+
+def calibrate_imu(raw, offset, scale, out=None):
+    """
+    returns `(raw - offset) * scale` as float32 for any array of raw samples
+    whose last axis is `(ax, ay, az, gx, gy, gz)`
+    """
+    _require_numpy()
+    out = np.subtract(raw, offset, out=out, dtype=np.float32)
+    out *= scale
+    return out
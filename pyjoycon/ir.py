@@ -1,4 +1,9 @@
 from . import joycon
+from collections import namedtuple
+import struct
+import time
+
+np = None  # imported on first use by IRFrameBuffer.array
 
 # exposure: 0-600 microseconds                         
 # pointingThreshold: 0-7
@@ -159,4 +164,159 @@ class IRRegisters:
                 if len(data) == 9:
                     j._set_mcu_registers([(0x00,0x07,0x01),])
                 data = data[9:]
-                
\ No newline at end of file
+
+
+IRCluster = namedtuple("ir_cluster", ["brightness", "pixels", "cm", "start", "end"])
+
+
+def _cluster_offsets(pointing):
+    # the records follow each other from byte 61, in IR_POINTING mode a byte is skipped after every three
+    offsets = []
+    i = 61
+    while i + 16 <= 59 + 300:
+        if pointing and i - 61 in (48, 97, 146, 195, 244):
+            i += 1
+        offsets.append(i)
+        i += 16
+    return offsets
+
+
+def _cluster_struct(offsets):
+    fmt, end = "<", offsets[0]
+    for offset in offsets:
+        fmt += "x" * (offset - end) + "8H"
+        end = offset + 16
+    return struct.Struct(fmt)
+
+
+_CLUSTER_STRUCTS = {pointing: _cluster_struct(_cluster_offsets(pointing)) for pointing in (False, True)}
+
+
+def _cluster(brightness, pixels, cm_y_64, cm_x_64, y_start, y_end, x_start, x_end):
+    return IRCluster(brightness, pixels, (cm_x_64 / 64., cm_y_64 / 64.), (x_start, y_start), (x_end, y_end))
+
+
+def decode_ir_cluster(data):
+    """returns the `IRCluster` of one 16 byte cluster record"""
+    return _cluster(*struct.unpack("<8H", data))
+
+
+def decode_ir_clusters(report, pointing=False):
+    """returns the `IRCluster`s of an IR_CLUSTERING (or IR_POINTING) report, unpacking all records at once"""
+    values = _CLUSTER_STRUCTS[pointing].unpack_from(report, 61)
+    return [_cluster(*values[i:i + 8]) for i in range(0, len(values), 8) if values[i]]
+
+
+class IRFrameBuffer:
+    """
+    Reassembles the fragments of IR_IMAGE frames into two preallocated
+    buffers. Fragments are copied into the back buffer and the buffers are
+    swapped when every fragment of a frame arrived, so `frame` always is a
+    whole frame and stays unchanged until the next one completes.
+    """
+    FRAGMENT_SIZE = 300
+
+    def __init__(self, fragments, width):
+        size = fragments * self.FRAGMENT_SIZE
+        self.fragments = fragments
+        self.width  = width
+        self.height = size // width
+        self._buffers = (bytearray(size), bytearray(size))
+        self._views   = tuple(memoryview(b) for b in self._buffers)
+        self._frames  = tuple(v.toreadonly() for v in self._views)
+        self._arrays  = None
+        self._back    = 0
+        self.frame    = None  # read-only memoryview of the latest complete frame
+
+        # fragments of the frame being assembled
+        self._received = bytearray(fragments)
+        self._requested = bytearray(fragments)  # asked for again
+        self._none_received = bytes(fragments)
+        self._cursor  = 0
+        self.received = 0
+        self.highest  = -1
+        self.started  = None  # time the first fragment arrived
+        self.stale    = False  # after a drop, until the next frame starts with fragment 0
+
+        self.frames_completed = 0
+        self.frames_dropped   = 0
+        self.fragments_retransmitted = 0
+
+    def write(self, fragment, data):
+        """
+        copies the payload of a fragment, a 300 byte slice of the report,
+        into the back buffer, returns False if it already was received or
+        is a late fragment of a dropped frame
+        """
+        if fragment >= self.fragments or self._received[fragment]:
+            return False
+        if self.stale:
+            if fragment:
+                return False
+            self.stale = False
+        self._received[fragment] = 1
+        if self._requested[fragment]:
+            self.fragments_retransmitted += 1
+        self.received += 1
+        if self.received == 1:
+            self.started = time.monotonic()
+        if fragment > self.highest:
+            self.highest = fragment
+        offset = fragment * self.FRAGMENT_SIZE
+        self._views[self._back][offset:offset + self.FRAGMENT_SIZE] = data
+        return True
+
+    def next_missing(self, below):
+        """
+        returns a missing fragment before `below` to be requested again,
+        cycling through them on successive calls, or None
+        """
+        i = self._received.find(0, self._cursor, below)
+        if i < 0:
+            i = self._received.find(0, 0, below)
+            if i < 0:
+                return None
+        self._cursor = i + 1
+        self._requested[i] = 1
+        return i
+
+    def complete(self):
+        """publishes the back buffer as the latest frame"""
+        self.frame = self._frames[self._back]
+        self._back ^= 1
+        self.frames_completed += 1
+        self._reset()
+
+    def drop(self):
+        """discards the fragments of an incomplete frame, and the ones still arriving late"""
+        self.frames_dropped += 1
+        self._reset()
+        self.stale = True
+
+    def _reset(self):
+        self._received[:] = self._none_received
+        self._requested[:] = self._none_received
+        self._cursor  = 0
+        self.received = 0
+        self.highest  = -1
+        self.started  = None
+
+    def array(self):
+        """returns the latest frame as a read-only `(height, width)` uint8 numpy array sharing its buffer"""
+        global np
+        if np is None:
+            try:
+                import numpy
+            except ImportError:
+                raise ImportError("numpy is required for IR images as arrays") from None
+            np = numpy
+        if self.frame is None:
+            return None
+        if self._arrays is None:
+            self._arrays = tuple(self._array(b) for b in self._buffers)
+        return self._arrays[self._back ^ 1]
+
+    def _array(self, buffer):
+        a = np.frombuffer(buffer, np.uint8, self.width * self.height).reshape(self.height, self.width)
+        a.flags.writeable = False
+        return a
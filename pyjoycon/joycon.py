@@ -1,18 +1,32 @@
 from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
 from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
-from .ir import IRRegisters
-import hid
+from .backend import default_backend
+from .state import InputState, decode_input_report
+from .history import ReportHistory
+from .rumble import encode_rumble
+from .output import OutputScheduler
+from .stick import DEFAULT_CALIBRATION, read_stick_calibration
+from .timing import ReportClock
 import time
 import threading
 import struct
 from typing import Optional
-from collections import namedtuple
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 # TODO: disconnect, power off sequence
 
+class _Reply(Future):
+    """resolves to the reply to an output report, `sent` is the monotonic time the report was written"""
+    sent = None
+
+
 class JoyCon:
     _INPUT_REPORT_SIZE = 360
     _INPUT_REPORT_PERIOD = 0.015
+    _REPLY_TIMEOUT = 16 * _INPUT_REPORT_PERIOD
+    _IR_START_TIMEOUT = 5.0
+    _IR_FRAME_TIMEOUT = 1.0
     IR_POINTING   = 4
     IR_CLUSTERING = 6
     IR_IMAGE      = 7
@@ -20,6 +34,7 @@ class JoyCon:
     _IR_FRAGMENT_SIZE = 300
     
     _RUMBLE_DATA = b'\x00\x01\x40\x40\x00\x01\x40\x40'
+    _PADDING = bytes(39)
     #_RUMBLE_DATA = b'\x00\x00\x00\x00\x00\x00\x00\x00'
 
     vendor_id  : int
@@ -28,8 +43,9 @@ class JoyCon:
     simple_mode: bool
     color_body : (int, int, int)
     color_btn  : (int, int, int)
+    connect_time: float
 
-    def __init__(self, vendor_id: int, product_id: int, serial: str = None, simple_mode=False, ir_mode=None, ir_registers=None):
+    def __init__(self, vendor_id: int, product_id: int, serial: str = None, simple_mode=False, ir_mode=None, ir_registers=None, backend=None, history=0, threaded=True, calibration_cache=None, output_interval=0.015, metrics=False):
         if vendor_id != JOYCON_VENDOR_ID:
             raise ValueError(f'vendor_id is invalid: {vendor_id!r}')
 
@@ -42,39 +58,116 @@ class JoyCon:
         self.product_id  = product_id
         self.serial      = serial
         self.simple_mode = simple_mode  # TODO: It's for reporting mode 0x3f
+        self._backend    = backend or default_backend
+        if calibration_cache is True:
+            from .cache import CalibrationCache
+            calibration_cache = CalibrationCache()
+        self.calibration_cache = calibration_cache
+        if metrics is True:
+            from .metrics import JoyConMetrics
+            metrics = JoyConMetrics()
+        self.metrics = metrics or None
 
         # setup internal state
         self._input_hooks = []
         self._input_report = bytes(self._INPUT_REPORT_SIZE)
+        self._input_state = decode_input_report(self._input_report)
+        self.history = ReportHistory(history, self._INPUT_REPORT_SIZE) if history else None
+        self._clock = ReportClock()
         self._packet_number = 0
+        self._rumble_data = self._RUMBLE_DATA
+        self._output_report = bytearray(49)
+        self._ir_ack_report = bytearray(49)
+        self._ir_ack_report[0]  = 0x11
+        self._ir_ack_report[10] = 0x03
+        self._ir_ack_report[48] = 0xFF
+        self._pending_replies = {}  # (report id, subcommand or MCU report type) -> deque of (confirm, future)
+        self._reply_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._update_input_report_thread = None
+        self._ir_frames = None
+        self._ir_clusters = (None, None)  # (report, its decoded clusters)
+        self._reader_ident = None  # the thread handling the input reports, if any
+        self._output_interval = output_interval  # pacing of the output reports, see _set_reader
+        self._output = None         # the OutputQueue of the output reports, if they are paced
+        self._output_thread = None  # the OutputScheduler started for them alone, if any
+        self._mac_address = None    # only read with a calibration cache or metrics
         self.set_accel_calibration((0, 0, 0), (1, 1, 1))
         self.set_gyro_calibration((0, 0, 0), (1, 1, 1))
+        self.set_stick_calibration(DEFAULT_CALIBRATION, DEFAULT_CALIBRATION)
 
         # connect to joycon
-        self._joycon_device = self._open(vendor_id, product_id, serial=None)
+        start = time.monotonic()
+        self._joycon_device = self._open(vendor_id, product_id, serial=serial)
         self._read_joycon_data()
         
         if self.ir_mode is not None:
             if self.ir_registers is None:
+                from .ir import IRRegisters  # only imported in an IR mode
                 self.ir_registers = IRRegisters()
                 self.ir_registers.defaults(self.ir_mode)
         
         self._setup_sensors()
+        self.connect_time = time.monotonic() - start  # seconds it took to bring the JoyCon up
 
+        if threaded:
+            self._start_update_input_report_thread()
+
+    def _start_update_input_report_thread(self):
         # start talking with the joycon in a daemon thread
         self._update_input_report_thread \
             = threading.Thread(target=self._update_input_report)
         self._update_input_report_thread.setDaemon(True)
         self._update_input_report_thread.start()
-        
+        self._set_reader(self._update_input_report_thread.ident)
+
+    def _set_reader(self, ident, output=None):
+        """
+        tells which thread handles the input reports from now on (None if
+        none does), replies are then awaited through it. The output reports
+        are then written at most one every `output_interval` seconds by
+        `output`, an `OutputScheduler` shared with other JoyCons like the one
+        of a `JoyConManager` reader thread, or else by one of their own
+        """
+        self._reader_ident = ident
+        if ident is None:
+            self._close_output()
+        elif self._output is None and self._output_interval:
+            if output is None:
+                output = self._output_thread = OutputScheduler()
+                output.start()
+            self._output = output.queue(self._write_output_now, self._output_interval, carried=("rumble",))
+
+    def _close_output(self):
+        """writes the waiting output reports, the following ones are written right away"""
+        output, self._output = getattr(self, "_output", None), None
+        if output is not None:
+            output.close()
+        thread, self._output_thread = getattr(self, "_output_thread", None), None
+        if thread is not None:
+            thread.close()
+
     def _show(self, data, direction):
         print(direction + (' '.join(('%02x'%datum for datum in data))))
        
-    def _request_ir_report(self,fragmentAcknowledge=0,ignore=False):
-        self._write_output_report(b'\x11', b'\x03', b'\x00\x00\x00'+bytes((fragmentAcknowledge,))+(b'\x00'*33)+b'\xFF', crcLocation=47, crcStart=11, crcLength=36, confirm=((0,0x31),) if ignore else None)            
+    def _request_ir_report(self,fragmentAcknowledge=0,ignore=False,missingFragment=None):
+        if not ignore:
+            self._send_ir_ack(fragmentAcknowledge, missingFragment)
+            return
+        missing = b'\x00\x00' if missingFragment is None else bytes((0x01, missingFragment))
+        self._write_output_report(b'\x11', b'\x03', b'\x00'+missing+bytes((fragmentAcknowledge,))+(b'\x00'*33)+b'\xFF', crcLocation=47, crcStart=11, crcLength=36, confirm=((0,0x31),) if ignore else None)            
         
+    def _wait_ir_data(self, reports):
+        """requests IR data and returns whether it arrived within the next `reports` input reports"""
+        self._request_ir_report()
+        for _ in range(reports):
+            if self._have_ir_data(self._read_input_report()):
+                return True
+        return False
+
     def _disable_ir_mode(self):
-        self._write_output_report(b'\x01', b'\x21', b'\x23\x01\x02', crcLocation=48, crcStart=12, crcLength=36)
+        self._write_output_report(b'\x01', b'\x21', b'\x23\x01\x02', crcLocation=48, crcStart=12, crcLength=36, confirm=((0,0x21),(14,0x21)))
         
     def _set_report_type(self, reportType):
         self._report_type = reportType
@@ -113,13 +206,11 @@ class JoyCon:
         if self.ir_registers is not None:
             self.ir_registers.write(self)
             
-        for retries in range(500):
-            self._request_ir_report()
-            report = self._read_input_report()
-            if self._have_ir_data(report):
-                break
-        else:
-            raise IOError("No IR data received")
+        # the first request starts the stream, repeat it only if no IR data follows
+        deadline = time.monotonic() + self._IR_START_TIMEOUT
+        while not self._wait_ir_data(4):
+            if time.monotonic() > deadline:
+                raise IOError("No IR data received")
 
         if self.ir_registers is not None:
             self.ir_registers.write(self)
@@ -127,10 +218,9 @@ class JoyCon:
         if self.ir_mode == JoyCon.IR_IMAGE:
             if self.ir_registers is not None:
                 self.ir_registers.write(self)
-            self._ir_fragment = 0
-            self._ir_data = [0,] * (self._ir_fragments * JoyCon._IR_FRAGMENT_SIZE)
-            self._ir_last_image = None
-            self._ir_last_fragment = 0
+            from .ir import IRFrameBuffer
+            self._ir_frames = IRFrameBuffer(self._ir_fragments + 1, self.ir_resolution)
+            self._ir_ack = 0
             
         self._request_ir_report(fragmentAcknowledge=0)
         return True
@@ -158,22 +248,20 @@ class JoyCon:
         return True
 
     def _open(self, vendor_id, product_id, serial):
-        try:
-            if hasattr(hid, "device"):  # hidapi
-                _joycon_device = hid.device()
-                _joycon_device.open(vendor_id, product_id, serial)
-            elif hasattr(hid, "Device"):  # hid
-                _joycon_device = hid.Device(vendor_id, product_id, serial)
-            else:
-                raise Exception("Implementation of hid is not recognized!")
-        except IOError as e:
-            raise IOError('joycon connect failed') from e
-        return _joycon_device
+        return self._backend(vendor_id, product_id, serial)
 
     def _close(self):
+        self._closed = True
+        self._close_output()
         if hasattr(self, "_joycon_device"):
             self._joycon_device.close()
             del self._joycon_device
+            with self._reply_lock:
+                pending, self._pending_replies = self._pending_replies, {}
+            for waiting in pending.values():
+                for _, future in waiting:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(IOError("device is closed"))
 
     def _read_input_report(self) -> bytes:
         out = bytes(self._joycon_device.read(self._INPUT_REPORT_SIZE))
@@ -198,39 +286,37 @@ class JoyCon:
         0xDE, 0xD9, 0xD0, 0xD7, 0xC2, 0xC5, 0xCC, 0xCB, 0xE6, 0xE1, 0xE8, 0xEF, 0xFA, 0xFD, 0xF4, 0xF3
     ]
         
+    _CRC8_TABLE = bytes(crc8_table)
+    _IR_ACK_CRCS = {}  # CRC of the IR ack payload by its varying bytes, it is zero otherwise
+
     def _crc8(self, data, start, length):
         crc8 = 0
-        for i in range(length):
-            crc8 = JoyCon.crc8_table[crc8^(0xFF & data[start+i])]
+        table = JoyCon._CRC8_TABLE
+        for byte in memoryview(data)[start:start+length]:
+            crc8 = table[crc8^byte]
         return crc8
 
-    def _write_output_report(self, command, subcommand, argument, crcLocation=None, crcStart=None, crcLength=None, confirm=None, confirmRetries=16):
+    def _write_output_report(self, command, subcommand, argument, crcLocation=None, crcStart=None, crcLength=None, confirm=None, confirmRetries=16, coalesce=None):
+        # while another thread reads the input reports, the reply is routed
+        # to us by that thread instead of being read here
+        awaited = confirm is not None and self._reader_ident not in (None, threading.get_ident())
         r = confirmRetries
         while r > 0:
-            # TODO: add documentation
-            data = b''.join([
-                command,
-                self._packet_number.to_bytes(1, byteorder='little'),
-                self._RUMBLE_DATA,
-                subcommand,
-                argument,
-            ])
-            if crcLocation is not None:
-                if len(data) < crcLocation:
-                    data += bytes((0,)) * (crcLocation - len(data))
-                data = data[:crcLocation] + self._crc8(data, crcStart, crcLength).to_bytes(1) + data[crcLocation+1:]
-                
-            if len(data)>49:
-                data = data[:49]
-            elif len(data)<49:
-                data += bytes((0,))*(49-len(data))
-            
-            self._joycon_device.write(data)
-            self._packet_number = (self._packet_number + 1) & 0xF
-            
+            future = self._send_output_report(command, subcommand, argument, crcLocation, crcStart, crcLength,
+                                              expect=confirm if awaited else None, coalesce=coalesce)
+
             if confirm is None:
                 return True
-                
+
+            if awaited:
+                report = self._await_reply(future)
+                if report is not None:
+                    return report
+                r -= 1
+                if r > 0 and self.metrics is not None:
+                    self.metrics.confirm_retries += 1
+                continue
+
             r2 = confirmRetries
             while r2 > 0:
                 report = self._read_input_report()
@@ -243,24 +329,138 @@ class JoyCon:
                 else:
                     return report
                     
+                if self.metrics is not None:
+                    self.metrics.discarded_reports += 1
                 if haveRightReportType:
                     r2 = 0
                 else:
                     r2 -= 1
                 
             r -= 1
+            if r > 0 and self.metrics is not None:
+                self.metrics.confirm_retries += 1
         raise IOError("Cannot confirm subcommand %02x" % subcommand[0])
 
-    def _send_subcmd_get_response(self, subcommand, argument) -> (bool, bytes):
-        # TODO: handle subcmd when daemon is running
-        self._write_output_report(b'\x01', subcommand, argument)
+    def _await_reply(self, future):
+        """
+        returns the reply resolving `future`, or None if it did not arrive
+        within _REPLY_TIMEOUT seconds of writing the report, however long the
+        report waited for the writer thread before
+        """
+        timeout = self._REPLY_TIMEOUT
+        while True:
+            try:
+                return future.result(timeout)
+            except FutureTimeoutError:
+                pass
+            sent = future.sent
+            if sent is not None:
+                timeout = sent + self._REPLY_TIMEOUT - time.monotonic()
+                if timeout <= 0:
+                    break
+        # a late reply must not resolve it, nor a retry write it twice
+        future.cancel()
+        if self._output is not None:
+            self._output.withdraw(future)
+        return None
+
+    def _send_output_report(self, command, subcommand, argument, crcLocation=None, crcStart=None, crcLength=None, expect=None, coalesce=None):
+        """
+        writes one output report, through the output scheduler once it runs,
+        if `expect` is a confirm pattern returns a future resolving to the
+        matching reply, or to None if the reply did not match it. Reports
+        with a `coalesce` key are replaced by newer ones while waiting.
+        """
+        future = None if expect is None else _Reply()
+        report = (command, subcommand, argument, crcLocation, crcStart, crcLength, expect, future)
+        if self._output is not None:
+            self._output.submit(report, coalesce)
+        else:
+            self._write_output_now(*report)
+        return future
+
+    def _write_output_now(self, command, subcommand, argument, crcLocation, crcStart, crcLength, expect, future):
+        if future is not None and future.cancelled():
+            return  # given up on while it waited
+        with self._write_lock:
+            # the report is built in place: command, packet number, rumble
+            # data, subcommand and its argument, zero padded to 49 bytes
+            data = self._output_report
+            data[0] = command[0]
+            data[1] = self._packet_number
+            data[2:10] = self._rumble_data
+            payload = subcommand + argument
+            if len(payload) >= 39:
+                data[10:] = payload[:39]
+            else:
+                data[10:] = payload + self._PADDING[len(payload):]
+            if crcLocation is not None:
+                data[crcLocation] = self._crc8(data, crcStart, crcLength)
+
+            if expect is not None:
+                # registered first, the reply may be handled before write returns
+                key = self._reply_key(command, subcommand, expect)
+                self._expect_reply(key, expect, future)
+                future.sent = time.monotonic()
+            try:
+                self._joycon_device.write(bytes(data))
+            except BaseException:
+                if expect is not None:
+                    self._forget_reply(key, future)
+                raise
+            self._packet_number = (self._packet_number + 1) & 0xF
 
-        report = self._read_input_report()
-        while report[0] != 0x21:  # TODO, avoid this, await daemon instead
-            report = self._read_input_report()
+    def _send_ir_ack(self, fragmentAcknowledge, missingFragment):
+        # sent for every IR report, only the packet number and the three
+        # bytes acknowledging a fragment or asking for a missing one change
+        with self._write_lock:
+            data = self._ir_ack_report
+            data[1] = self._packet_number
+            data[2:10] = self._rumble_data
+            if missingFragment is None:
+                key = fragmentAcknowledge
+                data[12] = data[13] = 0
+            else:
+                key = 0x10000 | missingFragment << 8 | fragmentAcknowledge
+                data[12] = 0x01
+                data[13] = missingFragment
+            data[14] = fragmentAcknowledge
+            crc = self._IR_ACK_CRCS.get(key)
+            if crc is None:
+                crc = self._IR_ACK_CRCS[key] = self._crc8(data, 11, 36)
+            data[47] = crc
+            self._joycon_device.write(bytes(data))
+            self._packet_number = (self._packet_number + 1) & 0xF
 
-        # TODO, remove, see the todo above
-        assert report[1:2] != subcommand, "THREAD carefully"
+    @staticmethod
+    def _reply_key(command, subcommand, confirm):
+        # subcommands are answered by a 0x21 report echoing their id, MCU
+        # requests by a 0x31 report carrying the MCU report type at 49
+        if command == b'\x01':
+            return (0x21, subcommand[0])
+        return (0x31, dict(confirm).get(49))
+
+    def _expect_reply(self, key, confirm, future):
+        with self._reply_lock:
+            self._pending_replies.setdefault(key, deque()).append((confirm, future))
+
+    def _forget_reply(self, key, future):
+        with self._reply_lock:
+            waiting = self._pending_replies.get(key, ())
+            for entry in waiting:
+                if entry[1] is future:
+                    waiting.remove(entry)
+                    break
+
+    def _send_subcommand(self, subcommand, argument) -> Future:
+        """
+        sends a subcommand while the input reports are being read, returns a
+        future resolving to the 0x21 reply report
+        """
+        return self._send_output_report(b'\x01', subcommand, argument, expect=())
+
+    def _send_subcmd_get_response(self, subcommand, argument) -> (bool, bytes):
+        report = self._write_output_report(b'\x01', subcommand, argument, confirm=((0,0x21),(14,subcommand[0])))
 
         # TODO: determine if the cut bytes are worth anything
 
@@ -280,73 +480,172 @@ class JoyCon:
         return report[7:size+7]
 
     def _update_input_report(self):  # daemon thread
+        try:
+            self._update_input_report_loop()
+        except (IOError, AttributeError):
+            if not self._closed:
+                raise
+
+    def _update_input_report_loop(self):
         while True:
-            report = self._read_input_report()
-            # TODO, handle input reports of type 0x21 and 0x3f
-            while report[0] != 0x30 and report[0] != 0x31:
-                report = self._read_input_report()
-                
-            self._input_report = report
-            if report[0] == 0x31 and self.ir_mode is not None:
-                if self._ir_fragments > 1:
-                    if report[49] == 0x03:
-                        f = report[52]
-                        #print(f,self._ir_fragment,self._ir_fragments)
-                        offset = f * JoyCon._IR_FRAGMENT_SIZE
-                        self._ir_data[offset:offset+JoyCon._IR_FRAGMENT_SIZE] = report[59:59+300]
-                        if f == self._ir_fragments:
-                            if f == self._ir_last_fragment:
-                                self._request_ir_report(0)
-                                self._ir_last_image = None
-                            else:
-                                self._request_ir_report(f)
-                                self._ir_last_image = self._ir_data
-                                self._ir_data = [0,]*(self._ir_fragments * JoyCon._IR_FRAGMENT_SIZE)
-                        else:
-                            self._request_ir_report(f)
-                            self._ir_last_image = None
-                        self._ir_last_fragment = f
-                        """
-                        if f == (self._ir_fragment + 1) % (self._ir_fragments + 1):
-                            self._ir_fragment = f
-                            self._request_ir_report(f) #f if f <= self._ir_fragments else 0)
-                            self._ir_data += report[59:59+300]
-                            if f == self._ir_fragments:
-                                l = len(self._ir_data)
-                                n = self.ir_resolution * self.ir_resolution * 3 // 4
-                                if n < l:
-                                    self._ir_last_image = self._ir_data[:n]
-                                elif n == l:
-                                    self._ir_last_image = self._ir_data
-                                else:
-                                    self._ir_last_image = self._ir_data + [0,]*(n - l)
-                                self._ir_data = []
-                            else:
-                                self._ir_last_image = None"""
-                    else:
-                        self._request_ir_report(self._ir_fragment) # TODO: handle missing
+            self._handle_report(self._read_input_report())
+
+    def _handle_report(self, report, received=None):
+        if self._pending_replies:
+            if report[0] == 0x21:
+                self._handle_reply(report, (0x21, report[14]))
+            elif report[0] == 0x31:
+                self._handle_reply(report, (0x31, report[49]))
+                self._handle_reply(report, (0x31, None))
+        if report[0] == 0x30 or report[0] == 0x31:
+            self._handle_input_report(report, received)
+        elif self.metrics is not None:
+            self.metrics.other_reports += 1
+        # TODO, handle input reports of type 0x3f
+
+    def _handle_reply(self, report, key):
+        # replies are matched to the oldest request waiting for the same key
+        with self._reply_lock:
+            waiting = self._pending_replies.get(key)
+            while waiting:
+                confirm, future = waiting.popleft()
+                if future.set_running_or_notify_cancel():
+                    matched = all(len(report) > pos and report[pos] == value for pos, value in confirm)
+                    future.set_result(report if matched else None)
+                    break
+            if waiting is not None and not waiting:
+                del self._pending_replies[key]
+
+    def _handle_input_report(self, report, received=None):
+        if received is None:
+            received = time.monotonic()
+        self._input_state = decode_input_report(
+            report, self._input_state.seq + 1, self._clock.update(report[1], received), received)
+        self._input_report = report
+        if self.history is not None:
+            self.history.append(report, received)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.input_report(self._input_state)
+        if report[0] == 0x31 and self.ir_mode is not None:
+            if self._ir_fragments > 1:
+                if report[49] == 0x03:
+                    self._handle_ir_fragment(report)
                 else:
-                    self._request_ir_report()
-                
+                    self._request_ir_report(self._ir_ack)
+            else:
+                self._request_ir_report()
+            
+        if metrics is None:
             for callback in self._input_hooks:
                 callback(self)
+        else:
+            metrics.run_hooks(self)
 
-    def _read_joycon_data(self):
-        color_data = self._spi_flash_read(0x6050, 6)
+    # colors, user stick calibration followed by the user IMU magic, factory stick calibration
+    _CALIBRATION_RANGES = ((0x6050, 6), (0x8010, 24), (0x603D, 18))
+
+    def _get_device_info(self):
+        """returns the firmware version and the MAC address of the JoyCon"""
+        ack, report = self._send_subcmd_get_response(b'\x02', b'')
+        if not ack:
+            raise IOError("After device info request: got NACK")
+        return "%d.%02x" % (report[2], report[3]), report[6:12].hex(":")
 
-        # TODO: use this
-        # stick_cal_addr = 0x8012 if self.is_left else 0x801D
-        # stick_cal  = self._spi_flash_read(stick_cal_addr, 8)
+    def _read_calibration_data(self):
+        spi = {address: self._spi_flash_read(address, size) for address, size in self._CALIBRATION_RANGES}
 
         # user IME data
-        if self._spi_flash_read(0x8026, 2) == b"\xB2\xA1":
-            # print(f"Calibrate {self.serial} IME with user data")
-            imu_cal = self._spi_flash_read(0x8028, 24)
+        if spi[0x8010][22:24] == b"\xB2\xA1":
+            spi[0x8028] = self._spi_flash_read(0x8028, 24)
 
         # factory IME data
         else:
-            # print(f"Calibrate {self.serial} IME with factory data")
-            imu_cal = self._spi_flash_read(0x6020, 24)
+            spi[0x6020] = self._spi_flash_read(0x6020, 24)
+        return spi
+
+    def _handle_ir_fragment(self, report):
+        frames = self._ir_frames
+        f = report[52]
+        last = self._ir_fragments
+        if self._ir_ack == last:
+            if f == last:
+                # a repeat of the frame we completed, the JoyCon missed our ack
+                self._request_ir_report(last)
+                return
+            if frames.stale and f:
+                # a late fragment of the frame we dropped, the next one starts at 0
+                self._request_ir_report(last)
+                return
+            self._ir_ack = 0
+        frames.write(f, memoryview(report)[59:59+JoyCon._IR_FRAGMENT_SIZE])
+        if frames.received == frames.fragments:
+            frames.complete()
+            self._ir_ack = last
+        elif frames.started is not None and time.monotonic() - frames.started > self._IR_FRAME_TIMEOUT:
+            # give up on the missing fragments and let the JoyCon move on to the next frame
+            frames.drop()
+            self._ir_ack = last
+        else:
+            # acknowledging the last fragment would end the frame, missing ones are asked for one by one
+            self._ir_ack = min(frames.highest, last - 1)
+            self._request_ir_report(self._ir_ack, missingFragment=frames.next_missing(frames.highest))
+            return
+        self._request_ir_report(last)
+
+    def get_ir_stats(self):
+        """
+        returns the counters of IR_IMAGE frames completed and dropped and of
+        fragments received again after being requested, or None in the other IR modes
+        """
+        frames = self._ir_frames
+        if frames is None:
+            return None
+        return {
+            "frames_completed": frames.frames_completed,
+            "frames_dropped": frames.frames_dropped,
+            "fragments_retransmitted": frames.fragments_retransmitted,
+        }
+
+    def get_report_stats(self):
+        """
+        returns the counters of input reports received and dropped (told from
+        gaps in the timer byte of the reports) and the fraction dropped
+        """
+        return self._clock.stats()
+
+    def stats(self) -> dict:
+        """
+        returns a snapshot of the report and IR counters, and with `metrics`
+        of the counters and histograms of `metrics.JoyConMetrics`
+        """
+        stats = self.get_report_stats()
+        ir_stats = self.get_ir_stats()
+        if ir_stats is not None:
+            stats.update(ir_stats)
+        if self.metrics is not None:
+            stats.update(self.metrics.snapshot())
+        return stats
+
+    def _read_joycon_data(self):
+        cache = self.calibration_cache
+        spi = None
+        if cache is not None or self.metrics is not None:
+            # the MAC address also tells the metrics of JoyCons apart
+            firmware, mac = self._get_device_info()
+            self._mac_address = mac
+        if cache is not None:
+            spi = cache.get(mac, self.product_id, firmware)
+        if spi is None:
+            spi = self._read_calibration_data()
+            if cache is not None:
+                cache.put(mac, self.product_id, firmware, spi)
+
+        self._calibration_spi = spi  # kept for recordings
+        color_data = spi[0x6050]
+        imu_cal = spi[0x8028] if 0x8028 in spi else spi[0x6020]
+        self._stick_cal_data = (spi[0x603D], spi[0x8010][:22])  # (factory, user)
+        self.set_stick_calibration(*read_stick_calibration(*self._stick_cal_data))
 
         self.color_body = tuple(color_data[:3])
         self.color_btn  = tuple(color_data[3:])
@@ -373,10 +672,10 @@ class JoyCon:
         )
 
     def _setup_sensors(self):
-        # Enable 6 axis sensors
-        self._write_output_report(b'\x01', b'\x40', b'\x01')
-        # It needs delta time to update the setting
-        time.sleep(0.02)
+        # Enable 6 axis sensors, the ack tells the setting is applied
+        self._write_output_report(b'\x01', b'\x40', b'\x01', confirm=((0xD,0x80),(0xE,0x40)))
+        # Enable vibration, the rumble data is ignored until then
+        self._write_output_report(b'\x01', b'\x48', b'\x01', confirm=((0xD,0x80),(0xE,0x48)))
 
         if self.ir_mode is None:
             # Change format of input report
@@ -384,8 +683,6 @@ class JoyCon:
             self._set_report_type(0x30)
         else: 
             self._enable_ir_mode()
-            
-        time.sleep(0.02)
 
     @staticmethod
     def _to_int16le_from_2bytes(hbytebe, lbytebe):
@@ -422,10 +719,20 @@ class JoyCon:
             self._ACCEL_COEFF_Y = 0x4000 / cy if cy != 0x4000 else 1
             self._ACCEL_COEFF_Z = 0x4000 / cz if cz != 0x4000 else 1
 
+    def set_stick_calibration(self, left=None, right=None):
+        """sets the `((x_min, x_center, x_max), (y_min, y_center, y_max))` raw ranges of the sticks"""
+        if left:
+            self._STICK_L_CALIBRATION = left
+        if right:
+            self._STICK_R_CALIBRATION = right
+
     def register_update_hook(self, callback):
         self._input_hooks.append(callback)
         return callback  # this makes it so you could use it as a decorator
 
+    def unregister_update_hook(self, callback):
+        self._input_hooks.remove(callback)
+
     def is_left(self):
         return self.product_id == JOYCON_L_PRODUCT_ID
 
@@ -433,253 +740,272 @@ class JoyCon:
         return self.product_id == JOYCON_R_PRODUCT_ID
 
     def get_battery_charging(self):
-        return self._get_nbit_from_input_report(2, 4, 1)
+        return self._input_state.battery_charging
 
     def get_battery_level(self):
-        return self._get_nbit_from_input_report(2, 5, 3)
+        return self._input_state.battery_level
 
     def get_button_y(self):
-        return self._get_nbit_from_input_report(3, 0, 1)
+        return self._input_state.buttons & 1
 
     def get_button_x(self):
-        return self._get_nbit_from_input_report(3, 1, 1)
+        return (self._input_state.buttons >> 1) & 1
 
     def get_button_b(self):
-        return self._get_nbit_from_input_report(3, 2, 1)
+        return (self._input_state.buttons >> 2) & 1
 
     def get_button_a(self):
-        return self._get_nbit_from_input_report(3, 3, 1)
+        return (self._input_state.buttons >> 3) & 1
 
     def get_button_right_sr(self):
-        return self._get_nbit_from_input_report(3, 4, 1)
+        return (self._input_state.buttons >> 4) & 1
 
     def get_button_right_sl(self):
-        return self._get_nbit_from_input_report(3, 5, 1)
+        return (self._input_state.buttons >> 5) & 1
 
     def get_button_r(self):
-        return self._get_nbit_from_input_report(3, 6, 1)
+        return (self._input_state.buttons >> 6) & 1
 
     def get_button_zr(self):
-        return self._get_nbit_from_input_report(3, 7, 1)
+        return (self._input_state.buttons >> 7) & 1
 
     def get_button_minus(self):
-        return self._get_nbit_from_input_report(4, 0, 1)
+        return (self._input_state.buttons >> 8) & 1
 
     def get_button_plus(self):
-        return self._get_nbit_from_input_report(4, 1, 1)
+        return (self._input_state.buttons >> 9) & 1
 
     def get_button_r_stick(self):
-        return self._get_nbit_from_input_report(4, 2, 1)
+        return (self._input_state.buttons >> 10) & 1
 
     def get_button_l_stick(self):
-        return self._get_nbit_from_input_report(4, 3, 1)
+        return (self._input_state.buttons >> 11) & 1
 
     def get_button_home(self):
-        return self._get_nbit_from_input_report(4, 4, 1)
+        return (self._input_state.buttons >> 12) & 1
 
     def get_button_capture(self):
-        return self._get_nbit_from_input_report(4, 5, 1)
+        return (self._input_state.buttons >> 13) & 1
 
     def get_button_charging_grip(self):
-        return self._get_nbit_from_input_report(4, 7, 1)
+        return (self._input_state.buttons >> 15) & 1
 
     def get_button_down(self):
-        return self._get_nbit_from_input_report(5, 0, 1)
+        return (self._input_state.buttons >> 16) & 1
 
     def get_button_up(self):
-        return self._get_nbit_from_input_report(5, 1, 1)
+        return (self._input_state.buttons >> 17) & 1
 
     def get_button_right(self):
-        return self._get_nbit_from_input_report(5, 2, 1)
+        return (self._input_state.buttons >> 18) & 1
 
     def get_button_left(self):
-        return self._get_nbit_from_input_report(5, 3, 1)
+        return (self._input_state.buttons >> 19) & 1
 
     def get_button_left_sr(self):
-        return self._get_nbit_from_input_report(5, 4, 1)
+        return (self._input_state.buttons >> 20) & 1
 
     def get_button_left_sl(self):
-        return self._get_nbit_from_input_report(5, 5, 1)
+        return (self._input_state.buttons >> 21) & 1
 
     def get_button_l(self):
-        return self._get_nbit_from_input_report(5, 6, 1)
+        return (self._input_state.buttons >> 22) & 1
 
     def get_button_zl(self):
-        return self._get_nbit_from_input_report(5, 7, 1)
+        return (self._input_state.buttons >> 23) & 1
 
     def get_stick_left_horizontal(self):
-        return self._get_nbit_from_input_report(6, 0, 8) \
-            | (self._get_nbit_from_input_report(7, 0, 4) << 8)
+        return self._input_state.stick_l[0]
 
     def get_stick_left_vertical(self):
-        return self._get_nbit_from_input_report(7, 4, 4) \
-            | (self._get_nbit_from_input_report(8, 0, 8) << 4)
+        return self._input_state.stick_l[1]
 
     def get_stick_right_horizontal(self):
-        return self._get_nbit_from_input_report(9, 0, 8) \
-            | (self._get_nbit_from_input_report(10, 0, 4) << 8)
+        return self._input_state.stick_r[0]
 
     def get_stick_right_vertical(self):
-        return self._get_nbit_from_input_report(10, 4, 4) \
-            | (self._get_nbit_from_input_report(11, 0, 8) << 4)
+        return self._input_state.stick_r[1]
 
     def get_accel_x(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[13 + sample_idx * 12],
-            self._input_report[14 + sample_idx * 12])
+        data = self._input_state.accel[sample_idx][0]
         return (data - self._ACCEL_OFFSET_X) * self._ACCEL_COEFF_X
 
     def get_accel_y(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[15 + sample_idx * 12],
-            self._input_report[16 + sample_idx * 12])
+        data = self._input_state.accel[sample_idx][1]
         return (data - self._ACCEL_OFFSET_Y) * self._ACCEL_COEFF_Y
 
     def get_accel_z(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[17 + sample_idx * 12],
-            self._input_report[18 + sample_idx * 12])
+        data = self._input_state.accel[sample_idx][2]
         return (data - self._ACCEL_OFFSET_Z) * self._ACCEL_COEFF_Z
 
     def get_gyro_x(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[19 + sample_idx * 12],
-            self._input_report[20 + sample_idx * 12])
+        data = self._input_state.gyro[sample_idx][0]
         return (data - self._GYRO_OFFSET_X) * self._GYRO_COEFF_X
 
     def get_gyro_y(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[21 + sample_idx * 12],
-            self._input_report[22 + sample_idx * 12])
+        data = self._input_state.gyro[sample_idx][1]
         return (data - self._GYRO_OFFSET_Y) * self._GYRO_COEFF_Y
 
     def get_gyro_z(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[23 + sample_idx * 12],
-            self._input_report[24 + sample_idx * 12])
+        data = self._input_state.gyro[sample_idx][2]
         return (data - self._GYRO_OFFSET_Z) * self._GYRO_COEFF_Z
         
     def get_ir_cluster(self, data):
-        brightness,pixels,cm_y_64,cm_x_64,y_start,y_end,x_start,x_end = struct.unpack("<HHHHHHHH", data)
-        return namedtuple("ir_cluster", ["brightness", "pixels", "cm", "start", "end"])(
-            brightness, pixels, (cm_x_64/64.,cm_y_64/64.), (x_start,y_start), (x_end,y_end));
+        from .ir import decode_ir_cluster
+        return decode_ir_cluster(data)
         
     def _have_ir_data(self, report):
         return self.ir_mode is not None and report[0] == 0x31 and report[49] == 0x03 and report[51] == self.ir_mode
         
-    def get_ir_image(self):
-        return self._ir_last_image
+    def get_ir_image(self, numpy=False):
+        """
+        returns the latest complete IR_IMAGE frame as a read-only memoryview,
+        or as a `(height, width)` uint8 numpy array sharing its buffer if
+        `numpy` is set, or None before the first frame
+        """
+        if self._ir_frames is None or self._ir_frames.frame is None:
+            return None
+        return self._ir_frames.array() if numpy else self._ir_frames.frame
 
     def get_ir_clusters(self):
         if self.ir_mode == JoyCon.IR_POINTING or self.ir_mode == JoyCon.IR_CLUSTERING:
-            clusters = []
-            if self._have_ir_data(self._input_report):
-                i = 61
-                while i + 16 <= 59+300:
-                    if self.ir_mode == JoyCon.IR_POINTING and (i == 61 + 48 or i == 61 + 97 or i == 61 + 146 or i == 61 + 195 or i == 61 + 244):
-                        i += 1
-                    if self._input_report[i] != 0 or self._input_report[i+1] !=0:
-                        clusters.append(self.get_ir_cluster(self._input_report[i:i+16]))
-                    i += 16
+            report = self._input_report
+            cached_report, clusters = self._ir_clusters
+            if report is not cached_report:
+                # decoded once per report, repeated calls return the same list
+                from .ir import decode_ir_clusters
+                clusters = decode_ir_clusters(report, self.ir_mode == JoyCon.IR_POINTING) if self._have_ir_data(report) else []
+                self._ir_clusters = (report, clusters)
             return clusters
         else:
             return None
 
-    def get_status(self) -> dict:
+    def snapshot(self) -> InputState:
+        """
+        returns the latest decoded input report. Snapshots are immutable and
+        replaced as a whole for every report, so all of their values belong
+        to the same report; compare `seq` to tell whether a new one arrived.
+        """
+        return self._input_state
+
+    def get_status(self, snapshot: InputState = None) -> dict:
+        state = snapshot or self._input_state
+        buttons = state.buttons
+        (ax, ay, az), (gx, gy, gz) = state.accel[0], state.gyro[0]
         out = {
             "battery": {
-                "charging": self.get_battery_charging(),
-                "level": self.get_battery_level(),
+                "charging": state.battery_charging,
+                "level": state.battery_level,
             },
             "buttons": {
                 "right": {
-                    "y": self.get_button_y(),
-                    "x": self.get_button_x(),
-                    "b": self.get_button_b(),
-                    "a": self.get_button_a(),
-                    "sr": self.get_button_right_sr(),
-                    "sl": self.get_button_right_sl(),
-                    "r": self.get_button_r(),
-                    "zr": self.get_button_zr(),
+                    "y": buttons & 1,
+                    "x": (buttons >> 1) & 1,
+                    "b": (buttons >> 2) & 1,
+                    "a": (buttons >> 3) & 1,
+                    "sr": (buttons >> 4) & 1,
+                    "sl": (buttons >> 5) & 1,
+                    "r": (buttons >> 6) & 1,
+                    "zr": (buttons >> 7) & 1,
                 },
                 "shared": {
-                    "minus": self.get_button_minus(),
-                    "plus": self.get_button_plus(),
-                    "r-stick": self.get_button_r_stick(),
-                    "l-stick": self.get_button_l_stick(),
-                    "home": self.get_button_home(),
-                    "capture": self.get_button_capture(),
-                    "charging-grip": self.get_button_charging_grip(),
+                    "minus": (buttons >> 8) & 1,
+                    "plus": (buttons >> 9) & 1,
+                    "r-stick": (buttons >> 10) & 1,
+                    "l-stick": (buttons >> 11) & 1,
+                    "home": (buttons >> 12) & 1,
+                    "capture": (buttons >> 13) & 1,
+                    "charging-grip": (buttons >> 15) & 1,
                 },
                 "left": {
-                    "down": self.get_button_down(),
-                    "up": self.get_button_up(),
-                    "right": self.get_button_right(),
-                    "left": self.get_button_left(),
-                    "sr": self.get_button_left_sr(),
-                    "sl": self.get_button_left_sl(),
-                    "l": self.get_button_l(),
-                    "zl": self.get_button_zl(),
+                    "down": (buttons >> 16) & 1,
+                    "up": (buttons >> 17) & 1,
+                    "right": (buttons >> 18) & 1,
+                    "left": (buttons >> 19) & 1,
+                    "sr": (buttons >> 20) & 1,
+                    "sl": (buttons >> 21) & 1,
+                    "l": (buttons >> 22) & 1,
+                    "zl": (buttons >> 23) & 1,
                 }
             },
             "analog-sticks": {
                 "left": {
-                    "horizontal": self.get_stick_left_horizontal(),
-                    "vertical": self.get_stick_left_vertical(),
+                    "horizontal": state.stick_l[0],
+                    "vertical": state.stick_l[1],
                 },
                 "right": {
-                    "horizontal": self.get_stick_right_horizontal(),
-                    "vertical": self.get_stick_right_vertical(),
+                    "horizontal": state.stick_r[0],
+                    "vertical": state.stick_r[1],
                 },
             },
             "accel": {
-                "x": self.get_accel_x(),
-                "y": self.get_accel_y(),
-                "z": self.get_accel_z(),
+                "x": (ax - self._ACCEL_OFFSET_X) * self._ACCEL_COEFF_X,
+                "y": (ay - self._ACCEL_OFFSET_Y) * self._ACCEL_COEFF_Y,
+                "z": (az - self._ACCEL_OFFSET_Z) * self._ACCEL_COEFF_Z,
             },
             "gyro": {
-                "x": self.get_gyro_x(),
-                "y": self.get_gyro_y(),
-                "z": self.get_gyro_z(),
+                "x": (gx - self._GYRO_OFFSET_X) * self._GYRO_COEFF_X,
+                "y": (gy - self._GYRO_OFFSET_Y) * self._GYRO_COEFF_Y,
+                "z": (gz - self._GYRO_OFFSET_Z) * self._GYRO_COEFF_Z,
             }
         }
         if self.ir_mode is not None:
             if self.ir_mode == JoyCon.IR_CLUSTERING or self.ir_mode == JoyCon.IR_POINTING:
                 out["ir_clusters"] = self.get_ir_clusters()
-            if self._ir_last_image:
-                out["ir_image"] = self._ir_last_image
+            ir_image = self.get_ir_image()
+            if ir_image is not None:
+                out["ir_image"] = ir_image
         return out
 
+    def set_rumble(self, high_freq=320.0, high_amp=0.0, low_freq=160.0, low_amp=0.0):
+        """
+        sets the HD rumble, frequencies in Hz and amplitudes from 0.0 to 1.0.
+        It is sent right away and embedded in every following output report.
+        """
+        side = encode_rumble(high_freq, high_amp, low_freq, low_amp)
+        self._rumble_data = side + side
+        self._send_output_report(b'\x10', b'', b'', coalesce="rumble")
+
+    def stop_rumble(self):
+        self.set_rumble()
+
     def set_player_lamp_on(self, on_pattern: int):
         self._write_output_report(
             b'\x01', b'\x30',
-            (on_pattern & 0xF).to_bytes(1, byteorder='little'))
+            (on_pattern & 0xF).to_bytes(1, byteorder='little'), coalesce="lamp")
 
     def set_player_lamp_flashing(self, flashing_pattern: int):
         self._write_output_report(
             b'\x01', b'\x30',
-            ((flashing_pattern & 0xF) << 4).to_bytes(1, byteorder='little'))
+            ((flashing_pattern & 0xF) << 4).to_bytes(1, byteorder='little'), coalesce="lamp")
 
     def set_player_lamp(self, pattern: int):
         self._write_output_report(
             b'\x01', b'\x30',
-            pattern.to_bytes(1, byteorder='little'))
+            pattern.to_bytes(1, byteorder='little'), coalesce="lamp")
 
     def disconnect_device(self):
         self._write_output_report(b'\x01', b'\x06', b'\x00')
 
+    def close(self):
+        """stops the input report thread and closes the device"""
+        self._close()
+        thread = self._update_input_report_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(1)
+
 
 if __name__ == '__main__':
     import pyjoycon.device as d
@@ -0,0 +1,213 @@
+from .joycon import JoyCon
+from .backend import set_nonblocking
+from .output import OutputScheduler
+from concurrent.futures import ThreadPoolExecutor
+import selectors
+import socket
+import threading
+import time
+
+
+def connect_all(ids, joycon_class=JoyCon, max_workers=None, **kwargs):
+    """
+    constructs a `joycon_class(*id, **kwargs)` for every id, like the ones
+    returned by `get_device_ids`, bringing them up concurrently. Returns the
+    JoyCons in the order of `ids`, the bring-up time of each one is its
+    `connect_time`. If any of them fails, the other ones are closed and the
+    first error is raised.
+    """
+    ids = list(ids)
+    if not ids:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(ids)) as executor:
+        futures = [executor.submit(joycon_class, *joycon_id, **kwargs) for joycon_id in ids]
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        for future in futures:
+            if future.exception() is None:
+                future.result().close()
+        raise errors[0]
+    return [future.result() for future in futures]
+
+
+class _ReaderThread(threading.Thread):
+    """
+    services the input reports of many JoyCons from a single thread, and
+    their output reports from a single writer thread
+    """
+
+    def __init__(self, manager):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.selector = selectors.DefaultSelector()
+        self.polled = ()  # JoyCons without a file descriptor
+        self.count = 0
+        self.reports = 0
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ)
+        self.output = OutputScheduler()
+        self.output.start()
+
+    def add(self, joycon):
+        device = joycon._joycon_device
+        if hasattr(device, "fileno"):
+            self.selector.register(device.fileno(), selectors.EVENT_READ, joycon)
+        else:
+            set_nonblocking(device)
+            self.polled += (joycon,)
+        joycon._set_reader(self.ident, self.output)
+        self.count += 1
+        self.wakeup()
+
+    def remove(self, joycon):
+        if joycon in self.polled:
+            self.polled = tuple(j for j in self.polled if j is not joycon)
+            device = getattr(joycon, "_joycon_device", None)
+            if device is not None and not joycon._closed:
+                try:
+                    set_nonblocking(device, False)  # synchronous reads wait for their reply again
+                except (IOError, AttributeError):
+                    pass  # a device which failed
+        else:
+            for key in list(self.selector.get_map().values()):
+                if key.data is joycon:
+                    self.selector.unregister(key.fileobj)
+        joycon._set_reader(None)
+        self.count -= 1
+        self.wakeup()
+
+    def wakeup(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            pass  # a wakeup is already pending, or the thread was closed
+
+    def close(self):
+        """releases the selector and the wakeup sockets once `run` has returned"""
+        self.selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+    def _read(self, joycon):
+        try:
+            report = joycon._read_input_report()
+        except (IOError, AttributeError) as e:
+            self.manager._failed(joycon, e)
+            return False
+        if not report:
+            return False
+        joycon._handle_report(report)
+        self.reports += 1
+        return True
+
+    def run(self):
+        poll_interval = self.manager.poll_interval
+        while self.manager._running:
+            for key, _ in self.selector.select(poll_interval if self.polled else None):
+                if key.data is None:
+                    try:
+                        while self._wakeup_r.recv(64):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self._read(key.data)
+            for joycon in self.polled:
+                while self._read(joycon):
+                    pass
+
+
+class JoyConManager:
+    """
+    Reads the input reports of any number of JoyCons from a small, fixed
+    number of reader threads instead of one thread per JoyCon. Devices which
+    expose a file descriptor are waited on with `select`/`epoll`, other ones
+    are switched to non-blocking reads and polled every `poll_interval`
+    seconds. The update hooks of each JoyCon run on its reader thread.
+    The output reports of the JoyCons of a reader thread are paced by a
+    single writer thread, each JoyCon at its own `output_interval`.
+
+        manager = JoyConManager()
+        for joycon_id in get_device_ids():
+            manager.connect(*joycon_id, joycon_class=ButtonEventJoyCon)
+    """
+
+    def __init__(self, threads=1, poll_interval=0.001):
+        if threads < 1:
+            raise ValueError(f'threads is invalid: {threads!r}')
+        self.poll_interval = poll_interval
+        self.joycons = []
+        self.errors = []  # (joycon, exception) of devices which were dropped
+        self._running = True
+        self._lock = threading.Lock()
+        self._assigned = {}
+        self._threads = [_ReaderThread(self) for _ in range(threads)]
+        for thread in self._threads:
+            thread.start()
+        self._throughput_time = time.monotonic()
+        self._throughput_reports = 0
+
+    def connect(self, vendor_id, product_id, serial=None, joycon_class=JoyCon, **kwargs):
+        """constructs a `joycon_class` read by this manager and adds it"""
+        joycon = joycon_class(vendor_id, product_id, serial, threaded=False, **kwargs)
+        self.add(joycon)
+        return joycon
+
+    def connect_all(self, ids, joycon_class=JoyCon, **kwargs):
+        """brings up a `joycon_class` for every id concurrently and adds them, see `connect_all`"""
+        joycons = connect_all(ids, joycon_class, threaded=False, **kwargs)
+        for joycon in joycons:
+            self.add(joycon)
+        return joycons
+
+    def add(self, joycon):
+        if joycon._update_input_report_thread is not None:
+            raise ValueError("the JoyCon already has its own input report thread, use threaded=False")
+        with self._lock:
+            thread = min(self._threads, key=lambda t: t.count)
+            thread.add(joycon)
+            self._assigned[id(joycon)] = thread
+            self.joycons.append(joycon)
+
+    def remove(self, joycon):
+        with self._lock:
+            thread = self._assigned.pop(id(joycon), None)
+            if thread is None:
+                return
+            thread.remove(joycon)
+            self.joycons.remove(joycon)
+
+    def _failed(self, joycon, error):
+        self.remove(joycon)
+        if not joycon._closed:
+            self.errors.append((joycon, error))
+
+    @property
+    def reports(self):
+        """the total amount of reports read so far"""
+        return sum(thread.reports for thread in self._threads)
+
+    def throughput(self):
+        """returns the aggregate reports per second since the previous call"""
+        now = time.monotonic()
+        reports = self.reports
+        rate = (reports - self._throughput_reports) / max(now - self._throughput_time, 1e-9)
+        self._throughput_time, self._throughput_reports = now, reports
+        return rate
+
+    def close(self):
+        """stops the reader threads and closes every JoyCon"""
+        self._running = False
+        for thread in self._threads:
+            thread.wakeup()
+        for thread in self._threads:
+            thread.join(1)
+            if not thread.is_alive():  # else stuck in a hook, it may still use them
+                thread.close()
+        for joycon in list(self.joycons):
+            joycon.close()
+        for thread in self._threads:
+            thread.output.close()
+        self.joycons.clear()
+        self._assigned.clear()
@@ -0,0 +1,220 @@
+"""
+Runtime metrics of JoyCons.
+
+`JoyCon(..., metrics=True)` counts what happens to the reports of the JoyCon
+and keeps histograms, with preallocated fixed buckets, of the report
+intervals and of the time spent in each update hook. `joycon.stats()`
+returns a snapshot, and `prometheus_text` / `serve_prometheus` export the
+snapshots of many JoyCons in the Prometheus text format:
+
+    joycons = connect_all(get_device_ids(), metrics=True)
+    server = serve_prometheus(joycons, port=9464)
+    ...
+    server.shutdown()
+"""
+from bisect import bisect_left
+import threading
+import time
+
+# upper bounds of the histogram buckets, in seconds, an infinite one follows
+INTERVAL_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.015, 0.02, 0.03, 0.05, 0.1, 0.25, 0.5, 1.0)
+JITTER_BUCKETS   = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+HOOK_BUCKETS     = (1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 5e-3, 1e-2)
+
+
+class Histogram:
+    """counts values into the buckets of the sorted upper `bounds`, and one for larger values"""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        """returns the bounds, the (not cumulative) bucket counts, their sum and the sum of the values"""
+        counts = list(self.counts)
+        return {"bounds": self.bounds, "counts": counts, "count": sum(counts), "sum": self.sum}
+
+
+class JoyConMetrics:
+    """
+    The counters and histograms of one JoyCon, updated by the thread handling
+    its input reports:
+
+    - `other_reports`: reports other than 0x30/0x31 input reports, replies
+      included, which reached the report handler
+    - `discarded_reports`: reports read and thrown away while waiting for the
+      reply to a subcommand without a reader thread
+    - `confirm_retries`: output reports sent again since their reply did not
+      arrive or did not match
+    - `report_interval`: seconds between the arrival of two input reports
+    - `report_jitter`: how much that differs from the time between them on
+      the device clock, see `timing.ReportClock`
+    - `hook_seconds`: time spent in each update hook, by hook name
+    """
+
+    def __init__(self, interval_buckets=INTERVAL_BUCKETS, jitter_buckets=JITTER_BUCKETS, hook_buckets=HOOK_BUCKETS):
+        self.other_reports = 0
+        self.discarded_reports = 0
+        self.confirm_retries = 0
+        self.report_interval = Histogram(interval_buckets)
+        self.report_jitter = Histogram(jitter_buckets)
+        self.hook_seconds = {}  # hook name -> Histogram
+        self._hook_buckets = hook_buckets
+        self._hooks = {}  # callback -> Histogram
+        self._received = None
+        self._timestamp = None
+        self._mean_interval = 0.0
+
+    def input_report(self, state):
+        """accounts for the input report decoded into `state`"""
+        received = state.received
+        last, self._received = self._received, received
+        if last is None:
+            return
+        interval = received - last
+        self.report_interval.observe(interval)
+        last, self._timestamp = self._timestamp, state.timestamp
+        if last is not None:
+            jitter = interval - (state.timestamp - last)
+            self.report_jitter.observe(jitter if jitter >= 0 else -jitter)
+        mean = self._mean_interval
+        self._mean_interval = mean + (interval - mean) * 0.05 if mean else interval
+
+    def run_hooks(self, joycon):
+        """calls the update hooks of `joycon`, timing each one"""
+        clock = time.perf_counter
+        for callback in joycon._input_hooks:
+            start = clock()
+            callback(joycon)
+            elapsed = clock() - start
+            histogram = self._hooks.get(callback)
+            if histogram is None:
+                histogram = self._hook_histogram(callback)
+            histogram.observe(elapsed)
+
+    def _hook_histogram(self, callback):
+        name = getattr(callback, "__qualname__", None) or type(callback).__qualname__
+        unique, n = name, 1
+        while unique in self.hook_seconds:
+            n += 1
+            unique = f'{name}#{n}'
+        histogram = self._hooks[callback] = self.hook_seconds[unique] = Histogram(self._hook_buckets)
+        return histogram
+
+    @property
+    def report_rate(self):
+        """input reports per second, averaged over the last few dozen"""
+        return 1 / self._mean_interval if self._mean_interval else 0.0
+
+    def snapshot(self):
+        return {
+            "other_reports": self.other_reports,
+            "discarded_reports": self.discarded_reports,
+            "confirm_retries": self.confirm_retries,
+            "report_rate": self.report_rate,
+            "report_interval": self.report_interval.snapshot(),
+            "report_jitter": self.report_jitter.snapshot(),
+            "hook_seconds": {name: h.snapshot() for name, h in list(self.hook_seconds.items())},
+        }
+
+
+# the Prometheus metrics exported from the keys of `JoyCon.stats()`
+_COUNTERS = (
+    ("reports", "input_reports_total", "input reports received"),
+    ("dropped", "reports_dropped_total", "input reports lost, from gaps in the report timer"),
+    ("other_reports", "other_reports_total", "reports other than input reports"),
+    ("discarded_reports", "discarded_reports_total", "reports discarded while waiting for a reply"),
+    ("confirm_retries", "confirm_retries_total", "output reports sent again for lack of a matching reply"),
+    ("frames_completed", "ir_frames_completed_total", "IR image frames completed"),
+    ("frames_dropped", "ir_frames_dropped_total", "IR image frames dropped"),
+    ("fragments_retransmitted", "ir_fragments_retransmitted_total", "IR image fragments received after being requested again"),
+)
+_GAUGES = (
+    ("drop_rate", "report_drop_ratio", "fraction of the input reports lost"),
+    ("report_rate", "report_rate", "input reports per second"),
+)
+_HISTOGRAMS = (
+    ("report_interval", "report_interval_seconds", "time between the arrival of two input reports"),
+    ("report_jitter", "report_jitter_seconds", "deviation of the report intervals from the device clock"),
+)
+
+
+def _labels(labels):
+    return ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in labels.items())
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    total = 0
+    for bound, count in zip(histogram["bounds"] + ("+Inf",), histogram["counts"]):
+        total += count
+        lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound if bound == "+Inf" else repr(float(bound)), total))
+    lines.append("%s_sum{%s} %r" % (name, labels, float(histogram["sum"])))
+    lines.append("%s_count{%s} %d" % (name, labels, total))
+    return lines
+
+
+def prometheus_text(joycons, prefix="pyjoycon_"):
+    """returns the stats of `joycons` in the Prometheus text exposition format"""
+    samples = []
+    for joycon in joycons:
+        # the serial is often left out, the MAC address is only known once read
+        device = getattr(joycon, "_mac_address", None) or "%x" % id(joycon)
+        labels = {"device": device, "serial": joycon.serial or "", "side": "L" if joycon.is_left() else "R"}
+        samples.append((labels, joycon.stats()))
+
+    lines = []
+
+    def family(name, kind, help, entries):
+        if entries:
+            lines.append(f'# HELP {prefix}{name} {help}')
+            lines.append(f'# TYPE {prefix}{name} {kind}')
+            lines.extend(entries)
+
+    for kind, metrics in (("counter", _COUNTERS), ("gauge", _GAUGES)):
+        for key, name, help in metrics:
+            family(name, kind, help, ["%s%s{%s} %r" % (prefix, name, _labels(labels), stats[key])
+                                      for labels, stats in samples if stats.get(key) is not None])
+    for key, name, help in _HISTOGRAMS:
+        family(name, "histogram", help, [line for labels, stats in samples if key in stats
+                                         for line in _histogram_lines(prefix + name, _labels(labels), stats[key])])
+    family("hook_seconds", "histogram", "time spent in the update hooks",
+           [line for labels, stats in samples
+            for hook, histogram in stats.get("hook_seconds", {}).items()
+            for line in _histogram_lines(prefix + "hook_seconds", _labels({**labels, "hook": hook}), histogram)])
+    return "\n".join(lines) + "\n"
+
+
+def serve_prometheus(joycons, port=9464, address="127.0.0.1", prefix="pyjoycon_"):
+    """
+    serves `prometheus_text` of `joycons` (an iterable read again for every
+    scrape, like `JoyConManager.joycons`, or a function returning one) over
+    HTTP from a daemon thread, returns the server; `server.shutdown()` stops it
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = prometheus_text(joycons() if callable(joycons) else list(joycons), prefix).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,181 @@
+from collections import deque
+import threading
+import time
+
+
+class OutputQueue:
+    """
+    The output reports of one JoyCon, written by an `OutputScheduler` with
+    `write`, at most one every `interval` seconds.
+
+    Reports are argument tuples for `write`, the last item of which is a
+    Future (or None) which fails if the report cannot be written. Reports
+    submitted with a `coalesce` key are cosmetic: a newer one with the same
+    key replaces the one still waiting, and they are only written when no
+    other report is waiting. Keys listed in `carried` name state which is
+    embedded in every report, those are dropped once any report was written.
+    At most `maxsize` other reports wait, `submit` blocks beyond that.
+    """
+
+    def __init__(self, scheduler, write, interval=0.015, maxsize=64, carried=()):
+        self.scheduler = scheduler
+        self._write    = write
+        self.interval  = interval
+        self.maxsize   = maxsize
+        self.carried   = carried
+        self._cond     = scheduler._cond
+        self._urgent   = deque()
+        self._cosmetic = {}  # coalesce key -> report, in the order they were first submitted
+        self._closed   = False
+        self._writing  = False
+        self.next_write = 0.0  # monotonic time from which the next report may be written
+        self.written   = 0
+        self.coalesced = 0
+        self.error     = None  # the last error of a report without a future
+
+    def submit(self, report, coalesce=None):
+        with self._cond:
+            if coalesce is None:
+                while len(self._urgent) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                raise IOError("device is closed")
+            if coalesce is None:
+                self._urgent.append(report)
+            else:
+                if coalesce in self._cosmetic:
+                    self.coalesced += 1
+                self._cosmetic[coalesce] = report
+            self._cond.notify_all()
+
+    def withdraw(self, future):
+        """removes the waiting report with the Future `future`, returns whether there was one"""
+        with self._cond:
+            for report in self._urgent:
+                if report[-1] is future:
+                    self._urgent.remove(report)
+                    self._cond.notify_all()  # there is room again
+                    return True
+        return False
+
+    def pending(self):
+        return bool(self._urgent or self._cosmetic)
+
+    def _next(self):
+        if self._urgent:
+            self._cond.notify_all()  # there is room again
+            report = self._urgent.popleft()
+        else:
+            key = next(iter(self._cosmetic))
+            report = self._cosmetic.pop(key)
+            if key in self.carried:
+                return report
+        for key in self.carried:
+            self._cosmetic.pop(key, None)
+        return report
+
+    def close(self, timeout=1.0):
+        """
+        writes the waiting reports for up to `timeout` seconds and removes
+        the queue from its scheduler, the futures of reports which were not
+        written fail
+        """
+        deadline = time.monotonic() + timeout
+        scheduler = self.scheduler
+        with self._cond:
+            if scheduler is not threading.current_thread():
+                while (self.pending() or self._writing) and scheduler.is_alive() and not scheduler._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self._closed = True
+            if self in scheduler._queues:
+                scheduler._queues.remove(self)
+            pending = list(self._urgent) + list(self._cosmetic.values())
+            self._urgent.clear()
+            self._cosmetic.clear()
+            self._cond.notify_all()
+        for report in pending:
+            future = report[-1]
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_exception(IOError("device is closed"))
+
+
+class OutputScheduler(threading.Thread):
+    """
+    Writes the output reports of one or more JoyCons from a single thread,
+    each one paced by its own `OutputQueue`. When several are due, the one
+    which has waited the longest goes first.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self._cond     = threading.Condition()
+        self._queues   = []
+        self._closed   = False
+        self._draining = False
+
+    def queue(self, write, interval=0.015, maxsize=64, carried=()):
+        """returns a new `OutputQueue` writing the reports of one JoyCon with `write`"""
+        with self._cond:
+            if self._closed:
+                raise IOError("output scheduler is closed")
+            queue = OutputQueue(self, write, interval, maxsize, carried)
+            self._queues.append(queue)
+        return queue
+
+    def _earliest(self):
+        earliest = None
+        for queue in self._queues:
+            if queue.pending() and (earliest is None or queue.next_write < earliest.next_write):
+                earliest = queue
+        return earliest
+
+    def run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    queue = self._earliest()
+                    if queue is None:
+                        if self._draining:
+                            return
+                        self._cond.wait()
+                        continue
+                    delay = queue.next_write - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)  # something more urgent may arrive meanwhile
+                report = queue._next()
+                queue._writing = True
+            try:
+                queue._write(*report)
+            except (IOError, AttributeError) as e:
+                future = report[-1]
+                if future is not None and future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+                else:
+                    queue.error = e
+            with self._cond:
+                queue._writing = False
+                queue.written += 1
+                queue.next_write = time.monotonic() + queue.interval
+                self._cond.notify_all()
+
+    def close(self, timeout=1.0):
+        """
+        writes the waiting reports for up to `timeout` seconds and stops the
+        thread, the futures of reports which were not written fail
+        """
+        with self._cond:
+            self._draining = True
+            self._cond.notify_all()
+        if self is not threading.current_thread() and self.is_alive():
+            self.join(timeout)
+        with self._cond:
+            self._closed = True
+            queues = list(self._queues)
+        for queue in queues:
+            queue.close(0)
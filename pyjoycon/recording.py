@@ -0,0 +1,337 @@
+"""
+Recording and replaying the input reports of a JoyCon.
+
+A recording starts with a header: the magic `PYJOYCON`, the format version
+and the header size as little endian uint32, and the metadata of the JoyCon
+as JSON, padded to a multiple of 64 bytes. Records of a fixed size follow,
+each a float64 monotonic receive time and the raw report, zero-padded to a
+multiple of 8 bytes:
+
+    recorder = Recorder("session.jcr", joycon)
+    ...
+    recorder.close()
+
+    recording = Recording("session.jcr")
+    recording.timestamps, recording.reports  # zero-copy NumPy views
+
+    backend = ReplayBackend(recording)
+    joycon = backend.connect(ButtonEventJoyCon)
+    joycon.register_update_hook(...)
+    backend.wait()
+"""
+from .constants import JOYCON_VENDOR_ID
+from .emulator import EmulatedJoyCon
+from . import imu
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC   = b"PYJOYCON"
+VERSION = 1
+
+_HEADER    = struct.Struct("<8sII")
+_TIMESTAMP = struct.Struct("<d")
+
+
+def recording_metadata(joycon):
+    """returns the metadata of a connected JoyCon stored in a recording"""
+    registers = joycon.ir_registers
+    return {
+        "vendor_id": joycon.vendor_id,
+        "product_id": joycon.product_id,
+        "serial": joycon.serial,
+        "side": "L" if joycon.is_left() else "R",
+        "ir_mode": joycon.ir_mode,
+        "ir_registers": None if registers is None else {f: getattr(registers, f) for f in registers.fields},
+        "calibration": {"%#06x" % address: data.hex() for address, data in joycon._calibration_spi.items()},
+        "report_size": joycon._INPUT_REPORT_SIZE if joycon.ir_mode is not None else 49,
+        "time": time.time(),
+    }
+
+
+class Recorder:
+    """
+    Appends every input report of `joycon`, as seen by its update hooks, to
+    the recording at `path` until `close` is called.
+    """
+
+    def __init__(self, path, joycon, buffering=1 << 16):
+        self.joycon = joycon
+        self.metadata = recording_metadata(joycon)
+        self.report_size = size = self.metadata["report_size"]
+        self.record_size = 8 + (size + 7) // 8 * 8
+        self.count = 0
+
+        meta = json.dumps(self.metadata, sort_keys=True).encode()
+        header_size = (_HEADER.size + len(meta) + 63) // 64 * 64
+        self._file = open(path, "wb", buffering)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, header_size) + meta.ljust(header_size - _HEADER.size))
+        self._record = bytearray(self.record_size)
+        self._lock = threading.Lock()
+        joycon.register_update_hook(self._record_report)
+
+    def _record_report(self, joycon):
+        record = self._record
+        report = joycon._input_report
+        n = min(len(report), self.report_size)
+        _TIMESTAMP.pack_into(record, 0, joycon._input_state.received)
+        record[8:8 + n] = report[:n]
+        if n < self.report_size:
+            record[8 + n:] = bytes(self.record_size - 8 - n)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(record)
+                self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self.joycon.unregister_update_hook(self._record_report)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """
+    A recording mapped into memory. `len(recording)` records are available,
+    `recording[i]` returns the timestamp and the report of one of them, and
+    with NumPy `timestamps`, `reports` and `imu()` are views of all of them.
+    A record which was still being written is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, header_size = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f'not a JoyCon recording: {path!r}')
+            if version != VERSION:
+                raise ValueError(f'unsupported recording version: {version!r}')
+            self.metadata = json.loads(f.read(header_size - _HEADER.size))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.report_size = self.metadata["report_size"]
+        self.record_size = 8 + (self.report_size + 7) // 8 * 8
+        self._offset = header_size
+        self._count = (len(self._map) - header_size) // self.record_size
+
+    @property
+    def ids(self):
+        """`(vendor_id, product_id, serial)` of the recorded JoyCon"""
+        m = self.metadata
+        return m["vendor_id"], m["product_id"], m["serial"]
+
+    @property
+    def calibration(self):
+        """the `{address: bytes}` SPI flash ranges read when the JoyCon connected"""
+        return {int(address, 16): bytes.fromhex(data) for address, data in self.metadata["calibration"].items()}
+
+    def joycon_kwargs(self):
+        """returns the `ir_mode` and `ir_registers` arguments to replay the recording with"""
+        registers = self.metadata["ir_registers"]
+        if registers is not None:
+            from .ir import IRRegisters
+            registers = IRRegisters(**registers)
+        return {"ir_mode": self.metadata["ir_mode"], "ir_registers": registers}
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("record index out of range")
+        offset = self._offset + i * self.record_size
+        return _TIMESTAMP.unpack_from(self._map, offset)[0], self._map[offset + 8:offset + 8 + self.report_size]
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    @property
+    def timestamps(self):
+        """the float64 timestamps as a read-only NumPy array of shape `(n,)`"""
+        imu._require_numpy()
+        return imu.np.ndarray((self._count,), "<f8", self._map, self._offset, (self.record_size,))
+
+    @property
+    def reports(self):
+        """the reports as a read-only uint8 NumPy array of shape `(n, report_size)`"""
+        imu._require_numpy()
+        return imu.np.ndarray((self._count, self.report_size), imu.np.uint8, self._map,
+                              self._offset + 8, (self.record_size, 1))
+
+    def imu(self):
+        """the raw IMU samples of every report as an int16 array of shape `(n, 3, 6)`, see `imu.raw_imu`"""
+        return imu.raw_imu(self.reports)
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # NumPy views are still around, the mapping goes away with them
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayJoyCon(EmulatedJoyCon):
+    """
+    An emulated JoyCon which answers the subcommands with the recorded
+    calibration, and once the input report mode is set sends the recorded
+    reports: as fast as they are read, or spaced as they were recorded
+    (divided by `speed`) if `realtime`. When all were sent `finished` is set
+    and reads block like with an idle JoyCon.
+    """
+
+    def __init__(self, recording, vendor_id=JOYCON_VENDOR_ID, product_id=None, serial=None, realtime=False, speed=1.0):
+        metadata = recording.metadata
+        if product_id is None:
+            product_id = metadata["product_id"]
+        super().__init__(vendor_id, product_id, serial or metadata["serial"], report_rate=None)
+        for address, data in recording.calibration.items():
+            self.spi_flash[address:address + len(data)] = data
+        self.recording = recording
+        self.realtime  = realtime
+        self.speed     = speed
+        self.position  = 0  # the next record to send
+        self.finished  = threading.Event()
+        self._start    = None
+        self._feeding  = False
+
+    def rewind(self):
+        """sends the records from the first one again, the JoyCon reads some while it connects"""
+        with self._cond:
+            self.position = 0
+            self._start = None
+            self.finished.clear()
+            self._cond.notify_all()
+
+    def _due(self):
+        # the monotonic time at which the next record is sent
+        timestamp = self.recording[self.position][0]
+        if self._start is None:
+            self._start = time.monotonic() - (timestamp - self.recording[0][0]) / self.speed
+        return self._start + (timestamp - self.recording[0][0]) / self.speed
+
+    def read(self, size, timeout_ms=0):
+        if self._report_mode not in (0x30, 0x31) or self._feeding:
+            return super().read(size, timeout_ms)
+        if self._nonblocking:
+            timeout_ms = 0
+        elif timeout_ms <= 0:
+            timeout_ms = None
+        deadline = None if timeout_ms is None else time.monotonic() + timeout_ms / 1000
+        with self._cond:
+            while not self._replies and not self._closed:
+                now = time.monotonic()
+                if self.position >= len(self.recording):
+                    self.finished.set()
+                    delay = None
+                elif self.realtime:
+                    delay = self._due() - now
+                    if delay <= 0:
+                        break
+                else:
+                    break
+                if deadline is not None:
+                    if deadline <= now:
+                        return b""
+                    delay = deadline - now if delay is None else min(delay, deadline - now)
+                self._cond.wait(delay)
+            if self._closed:
+                raise IOError("device is closed")
+            if self._replies:
+                return bytes(self._replies.popleft()[:size])
+            report = self.recording[self.position][1]
+            self.position += 1
+            self.reports_sent += 1
+        return bytes(report[:size])
+
+    def _reply(self, subcommand, ack, data=b""):
+        if not self._feeding:
+            super()._reply(subcommand, ack, data)
+
+    def _mcu_reply(self, data):
+        if not self._feeding:
+            super()._mcu_reply(data)
+
+    def feed(self, handle):
+        """calls `handle(report, timestamp)` with every remaining record, in the calling thread"""
+        self._feeding = True  # nothing reads the replies anymore
+        recording = self.recording
+        for i in range(self.position, len(recording)):
+            self.position = i
+            if self.realtime:
+                delay = self._due() - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            timestamp, report = recording[i]
+            handle(bytes(report), timestamp)
+        self.position = len(recording)
+        self.finished.set()
+
+
+class ReplayBackend:
+    """
+    A backend replaying a recording (or the path of one) into the JoyCon
+    using it. A JoyCon from `connect` only starts reading the records with
+    `start` (or `wait`), so that update hooks can be registered before, and
+    `wait` returns once all were handled. With `threaded=False`, `feed` hands
+    them to the JoyCon in the calling thread instead, which is the fastest
+    way to run the update hooks over a long recording.
+    """
+
+    def __init__(self, recording, realtime=False, speed=1.0):
+        if isinstance(recording, (str, os.PathLike)):
+            recording = Recording(recording)
+        self.recording = recording
+        self.realtime  = realtime
+        self.speed     = speed
+        self.device    = None
+        self._joycon   = None  # connected, waiting for `start` to read the records
+
+    def __call__(self, vendor_id, product_id, serial=None):
+        self.device = ReplayJoyCon(self.recording, vendor_id, product_id, serial, self.realtime, self.speed)
+        return self.device
+
+    def connect(self, joycon_class=None, threaded=True, **kwargs):
+        """returns a `joycon_class` (PythonicJoyCon by default) connected to the recording"""
+        if joycon_class is None:
+            from .wrappers import PythonicJoyCon as joycon_class
+        vendor_id, product_id, serial = self.recording.ids
+        kwargs = {**self.recording.joycon_kwargs(), **kwargs}
+        joycon = joycon_class(vendor_id, product_id, serial, backend=self, threaded=False, **kwargs)
+        if threaded:
+            self._joycon = joycon
+        return joycon
+
+    def start(self):
+        """lets the JoyCon from `connect` read the records, from the first one"""
+        joycon, self._joycon = self._joycon, None
+        if joycon is not None:
+            self.device.rewind()
+            joycon._start_update_input_report_thread()
+
+    def wait(self, timeout=None):
+        """starts the replay if needed and waits until the JoyCon read every record, returns False on timeout"""
+        self.start()
+        return self.device.finished.wait(timeout)
+
+    def feed(self, joycon):
+        """feeds every record to a JoyCon connected with `threaded=False`"""
+        self.device.rewind()
+        self.device.feed(joycon._handle_report)
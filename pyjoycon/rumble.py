@@ -0,0 +1,63 @@
+"""
+HD rumble encoding.
+
+The rumble data of an output report holds 4 bytes per side (left, then
+right), each describing a high band (81.75 - 1252.57 Hz) and a low band
+(40.87 - 626.28 Hz) frequency with their amplitude (0.0 - 1.0). The encoded
+values are looked up in tables indexed by the frequency in whole Hz and by
+the amplitude in thousandths.
+"""
+from math import log2
+
+HIGH_FREQ_RANGE = (81.75, 1252.57)
+LOW_FREQ_RANGE  = (40.87, 626.28)
+
+
+def _encode_freq(freq):
+    return round(log2(freq / 10.0) * 32.0)
+
+
+def _encode_amp(amp):
+    if amp <= 0:
+        return 0
+    if amp > 0.23:
+        return round(log2(amp * 8.7) * 32.0)
+    if amp > 0.12:
+        return round(log2(amp * 17.0) * 16.0)
+    return max(1, round(log2(amp) * 4.0 + 28.0))
+
+
+# high band frequency, 9 bits split over the first two bytes
+_HIGH_FREQ = tuple((min(max(_encode_freq(max(f, 1)), 0x60), 0xDF) - 0x60) * 4 for f in range(1300))
+# low band frequency, 7 bits of the third byte
+_LOW_FREQ = tuple(min(max(_encode_freq(max(f, 1)), 0x40), 0xBF) - 0x40 for f in range(700))
+_AMP = tuple(min(_encode_amp(a / 1000), 100) for a in range(1001))
+# high band amplitude, added to the second byte
+_HIGH_AMP = tuple(e * 2 for e in _AMP)
+# low band amplitude, the lowest bit of the encoded value goes into bit 7 of the third byte
+_LOW_AMP = tuple(((e & 1) << 15) | ((e >> 1) + 0x40) for e in _AMP)
+
+IDLE = b'\x00\x01\x40\x40'
+
+
+def _index(value, table):
+    i = int(value + 0.5)
+    if i < 0:
+        return 0
+    if i >= len(table):
+        return len(table) - 1
+    return i
+
+
+def encode_rumble(high_freq=320.0, high_amp=0.0, low_freq=160.0, low_amp=0.0) -> bytes:
+    """returns the 4 bytes of rumble data of one side"""
+    hf = _HIGH_FREQ[_index(high_freq, _HIGH_FREQ)]
+    lf = _LOW_FREQ[_index(low_freq, _LOW_FREQ)]
+    hf_amp = _HIGH_AMP[_index(high_amp * 1000, _AMP)]
+    lf_amp = _LOW_AMP[_index(low_amp * 1000, _AMP)]
+    return bytes((
+        hf & 0xFF,
+        hf_amp + (hf >> 8),
+        lf + (lf_amp >> 8),
+        lf_amp & 0xFF,
+    ))
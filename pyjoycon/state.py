@@ -0,0 +1,66 @@
+from .constants import BUTTON_BITS
+from .timing import TICK
+from collections import namedtuple
+import struct
+
+# report id, timer, battery, 3 button bytes, 6 stick bytes, (vibrator), 3 IMU samples
+_INPUT_REPORT = struct.Struct("<12Bx18h")
+
+
+class InputState(namedtuple("InputState", [
+        "report_id", "timer", "battery_level", "battery_charging",
+        "buttons", "stick_l", "stick_r", "accel", "gyro", "seq",
+        "timestamp", "received"])):
+    """
+    An immutable snapshot of one decoded 0x30/0x31 input report.
+
+    `seq` counts the input reports received by the JoyCon, a snapshot with
+    the same `seq` as a previous one holds the same data.
+
+    `buttons` is the 24 bit button field, see `constants.BUTTON_BITS`.
+    `stick_l` and `stick_r` are raw 12 bit `(horizontal, vertical)` tuples.
+    `accel` and `gyro` hold the three uncalibrated `(x, y, z)` IMU samples,
+    oldest first.
+
+    `timestamp` is when the report was sent on the device clock, see
+    `timing.ReportClock`, and `received` the `time.monotonic()` at which it
+    arrived. Both are None for reports decoded outside of a JoyCon.
+    """
+    __slots__ = ()
+
+    def button(self, name):
+        return (self.buttons >> BUTTON_BITS[name]) & 1
+
+    def sample_times(self):
+        """
+        returns the device clock timestamps of the three IMU samples, oldest
+        first, or None before the JoyCon received a report
+        """
+        t = self.timestamp
+        if t is None:
+            return None
+        return (t - 2 * TICK, t - TICK, t)
+
+
+_new_state = tuple.__new__
+
+
+def decode_input_report(report, seq=0, timestamp=None, received=None) -> InputState:
+    (report_id, timer, battery, b0, b1, b2, l0, l1, l2, r0, r1, r2,
+     ax0, ay0, az0, gx0, gy0, gz0,
+     ax1, ay1, az1, gx1, gy1, gz1,
+     ax2, ay2, az2, gx2, gy2, gz2) = _INPUT_REPORT.unpack_from(report)
+    return _new_state(InputState, (
+        report_id,
+        timer,
+        battery >> 5,
+        (battery >> 4) & 1,
+        b0 | (b1 << 8) | (b2 << 16),
+        (l0 | ((l1 & 0xF) << 8), (l1 >> 4) | (l2 << 4)),
+        (r0 | ((r1 & 0xF) << 8), (r1 >> 4) | (r2 << 4)),
+        ((ax0, ay0, az0), (ax1, ay1, az1), (ax2, ay2, az2)),
+        ((gx0, gy0, gz0), (gx1, gy1, gz1), (gx2, gy2, gz2)),
+        seq,
+        timestamp,
+        received,
+    ))
@@ -0,0 +1,82 @@
+"""
+Analog stick calibration.
+
+The SPI flash holds a factory calibration of each stick (0x603D left, 0x6046
+right) and optionally a user calibration (0x8012 left, 0x801D right, each
+preceded by the magic 0xB2 0xA1). A calibration gives per axis the center
+and how far the stick reaches below and above it, in raw 12 bit units.
+
+Raw values are turned into floats from -1.0 to 1.0 by a table of 4096 entries
+per axis, built once, so a reading costs one lookup per axis.
+"""
+
+USER_MAGIC = b"\xB2\xA1"
+
+# used when the JoyCon holds no calibration
+DEFAULT_CALIBRATION = ((2048 - 1408, 2048, 2048 + 1408), (2048 - 1408, 2048, 2048 + 1408))
+
+
+def _decode_12bit(data):
+    return (
+        data[0] | ((data[1] & 0x0F) << 8), (data[1] >> 4) | (data[2] << 4),
+        data[3] | ((data[4] & 0x0F) << 8), (data[4] >> 4) | (data[5] << 4),
+        data[6] | ((data[7] & 0x0F) << 8), (data[7] >> 4) | (data[8] << 4),
+    )
+
+
+def decode_stick_calibration(data, left):
+    """
+    returns `((x_min, x_center, x_max), (y_min, y_center, y_max))` from the 9
+    bytes of a stick calibration, or None if they hold no calibration
+    """
+    if data == b"\xFF" * 9:
+        return None
+    v = _decode_12bit(data)
+    if left:  # above the center, center, below the center
+        above, center, below = v[0:2], v[2:4], v[4:6]
+    else:     # center, below the center, above the center
+        center, below, above = v[0:2], v[2:4], v[4:6]
+    if not all(above) or not all(below):
+        return None
+    return tuple((c - b, c, c + a) for b, c, a in zip(below, center, above))
+
+
+def read_stick_calibration(factory, user):
+    """
+    returns the `(left, right)` stick calibrations from the 18 bytes at 0x603D
+    and the 22 bytes at 0x8010, preferring the user calibration of each stick
+    """
+    calibration = []
+    for left, factory_data, user_data in ((True, factory[0:9], user[0:11]), (False, factory[9:18], user[11:22])):
+        cal = None
+        if user_data[:2] == USER_MAGIC:
+            cal = decode_stick_calibration(user_data[2:], left)
+        if cal is None:
+            cal = decode_stick_calibration(factory_data, left)
+        calibration.append(cal or DEFAULT_CALIBRATION)
+    return tuple(calibration)
+
+
+def stick_table(low, center, high, deadzone=0.1, saturation=0.95):
+    """
+    returns a tuple mapping each raw 12 bit value of an axis to a float from
+    -1.0 to 1.0: values within `deadzone` of the center map to 0.0 and values
+    beyond `saturation` of the range to -1.0 or 1.0, linear in between
+    """
+    if not 0 <= deadzone < saturation <= 1:
+        raise ValueError(f'need 0 <= deadzone < saturation <= 1, got {deadzone!r}, {saturation!r}')
+    below = max(center - low, 1)
+    above = max(high - center, 1)
+    scale = 1.0 / (saturation - deadzone)
+    table = []
+    for raw in range(4096):
+        d = raw - center
+        r = d / above if d > 0 else d / below
+        m = (abs(r) - deadzone) * scale
+        if m <= 0:
+            table.append(0.0)
+        elif m >= 1:
+            table.append(1.0 if r > 0 else -1.0)
+        else:
+            table.append(m if r > 0 else -m)
+    return tuple(table)
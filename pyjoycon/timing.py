@@ -0,0 +1,66 @@
+"""
+Report timing from the timer byte of the reports.
+
+Byte 1 of every report the JoyCon sends is a free running 8 bit timer
+counting in 5 ms ticks, which advances by 3 between two input reports (one
+report carries three IMU samples, 5 ms apart). `ReportClock` unwraps it into
+a device clock and counts the reports which never arrived.
+"""
+
+TICK = 0.005  # seconds per timer tick, also the spacing of the IMU samples
+
+
+class ReportClock:
+    """
+    Turns the timer bytes of consecutive input reports into timestamps on the
+    device clock, in seconds from the host time the first report was received.
+    Unlike the host receive times they are free of radio and scheduling
+    jitter, so differences between them are the real time between samples.
+
+    Timer gaps of more than `report_ticks` are counted as `dropped` reports.
+    Gaps too long for the 8 bit timer to tell apart (1.28 s) are resolved with
+    the host clock.
+    """
+
+    def __init__(self, report_ticks=3):
+        self.report_ticks = report_ticks
+        self.reports = 0
+        self.dropped = 0
+        self.gaps = 0           # times one or more reports in a row were dropped
+        self.ticks = None       # the unwrapped timer of the last report
+        self._timer = 0
+        self._received = 0.0
+        self._origin = 0.0      # host time of tick 0
+
+    def update(self, timer, received):
+        """returns the timestamp of a report with the timer byte `timer`, received at the host time `received`"""
+        self.reports += 1
+        ticks = self.ticks
+        if ticks is None:
+            self.ticks = 0
+            self._timer = timer
+            self._received = self._origin = received
+            return received
+        delta = (timer - self._timer) & 0xFF
+        elapsed = received - self._received
+        if elapsed > 0x80 * TICK:
+            # the timer may have wrapped around, maybe more than once
+            delta += round((elapsed / TICK - delta) / 0x100) * 0x100
+        missed = (delta + self.report_ticks // 2) // self.report_ticks - 1
+        if missed > 0:
+            self.dropped += missed
+            self.gaps += 1
+        self.ticks = ticks = ticks + delta
+        self._timer = timer
+        self._received = received
+        return self._origin + ticks * TICK
+
+    def stats(self):
+        """returns the counters of input reports received and dropped"""
+        total = self.reports + self.dropped
+        return {
+            "reports": self.reports,
+            "dropped": self.dropped,
+            "gaps": self.gaps,
+            "drop_rate": self.dropped / total if total else 0.0,
+        }
@@ -0,0 +1,94 @@
+"""
+The small subset of PyGLM used by `GyroTrackingJoyCon`, for when PyGLM is not
+installed: `vec2` and `vec3` with component-wise arithmetic, `quat(w, x, y, z)`
+and `eulerAngles`.
+"""
+from math import asin, atan2
+
+
+class _vec(tuple):
+    __slots__ = ()
+    _size = 0
+
+    def __new__(cls, *components):
+        if len(components) == 1:
+            value = components[0]
+            components = value if hasattr(value, "__len__") else (value,) * cls._size
+        if len(components) != cls._size:
+            raise ValueError(f'{cls.__name__} needs {cls._size} components, got {len(components)}')
+        return tuple.__new__(cls, (float(c) for c in components))
+
+    def _zip(self, other):
+        if isinstance(other, (int, float)):
+            return ((a, other) for a in self)
+        if len(other) != len(self):
+            raise ValueError(f'{type(self).__name__} needs {len(self)} components, got {len(other)}')
+        return zip(self, other)
+
+    def __add__(self, other):
+        return type(self)(*(a + b for a, b in self._zip(other)))
+
+    def __sub__(self, other):
+        return type(self)(*(a - b for a, b in self._zip(other)))
+
+    def __mul__(self, other):
+        return type(self)(*(a * b for a, b in self._zip(other)))
+
+    def __truediv__(self, other):
+        return type(self)(*(a / b for a, b in self._zip(other)))
+
+    def __rsub__(self, other):
+        return type(self)(*(b - a for a, b in self._zip(other)))
+
+    def __rtruediv__(self, other):
+        return type(self)(*(b / a for a, b in self._zip(other)))
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return type(self)(*(-a for a in self))
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%g" % a for a in self))
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+
+
+class vec2(_vec):
+    __slots__ = ()
+    _size = 2
+
+
+class vec3(_vec):
+    __slots__ = ()
+    _size = 3
+
+    z = property(lambda self: self[2])
+
+
+class quat(tuple):
+    """a rotation quaternion, stored and constructed in `(w, x, y, z)` order"""
+    __slots__ = ()
+
+    def __new__(cls, w=1.0, x=0.0, y=0.0, z=0.0):
+        return tuple.__new__(cls, (float(w), float(x), float(y), float(z)))
+
+    def __repr__(self):
+        return "quat(%g, {%g, %g, %g})" % self
+
+    w = property(lambda self: self[0])
+    x = property(lambda self: self[1])
+    y = property(lambda self: self[2])
+    z = property(lambda self: self[3])
+
+
+def eulerAngles(q):
+    """returns the `(pitch, yaw, roll)` of `q` in radians, like glm"""
+    w, x, y, z = q
+    a, b = 2 * (y * z + w * x), w * w - x * x - y * y + z * z
+    pitch = 2 * atan2(x, w) if a == b == 0 else atan2(a, b)
+    yaw = asin(max(-1.0, min(1.0, -2 * (x * z - w * y))))
+    roll = atan2(2 * (x * y + w * z), w * w + x * x - y * y - z * z)
+    return vec3(pitch, yaw, roll)
@@ -1,4 +1,6 @@
 from .joycon import JoyCon
+from . import imu
+from .stick import stick_table
 
 
 # Preferably, this class gets merged into the
@@ -13,11 +15,37 @@ class PythonicJoyCon(JoyCon):
         gyroscope and accelerometer into a list
      *  Adds the option to invert the y and z axis of the left joycon
         to make it match the right joycon. This is enabled by default
+     *  reports the sticks calibrated from -1.0 to 1.0, with a deadzone
+        around the center and saturation at `stick_saturation` of the range
     """
 
-    def __init__(self, *a, invert_left_ime_yz=True, **kw):
+    _ACCEL_UNITS = {"raw": 1, "g": 4.0 / 0x4000}
+    _GYRO_UNITS  = {"raw": 1, "deg": 0.06103, "rad": 0.0001694 * 3.1415926536, "rot": 0.0001694}
+
+    def __init__(self, *a, invert_left_ime_yz=True, stick_deadzone=0.1, stick_saturation=0.95, **kw):
         super().__init__(*a, **kw)
         self._ime_yz_coeff = -1 if invert_left_ime_yz and self.is_left() else 1
+        self._imu_calibration = {}
+        self.set_stick_deadzone(stick_deadzone, stick_saturation)
+
+    def set_stick_deadzone(self, deadzone=0.1, saturation=0.95):
+        """sets the fractions of the stick range mapped to 0.0 around the center and to -1.0 / 1.0 at the ends"""
+        if not 0 <= deadzone < saturation <= 1:
+            raise ValueError(f'need 0 <= deadzone < saturation <= 1, got {deadzone!r}, {saturation!r}')
+        self._stick_deadzone = (deadzone, saturation)
+        self._stick_tables = None
+
+    def set_gyro_calibration(self, offset_xyz=None, coeff_xyz=None):
+        super().set_gyro_calibration(offset_xyz, coeff_xyz)
+        self._imu_calibration = {}
+
+    def set_accel_calibration(self, offset_xyz=None, coeff_xyz=None):
+        super().set_accel_calibration(offset_xyz, coeff_xyz)
+        self._imu_calibration = {}
+
+    def set_stick_calibration(self, left=None, right=None):
+        super().set_stick_calibration(left, right)
+        self._stick_tables = None
 
     is_charging   = property(JoyCon.get_battery_charging)
     battery_level = property(JoyCon.get_battery_level)
@@ -51,92 +79,113 @@ class PythonicJoyCon(JoyCon):
     set_led          = JoyCon.set_player_lamp
     disconnect       = JoyCon.disconnect_device
 
+    def _build_stick_tables(self):
+        deadzone, saturation = self._stick_deadzone
+        self._stick_tables = tables = tuple(
+            tuple(stick_table(*axis, deadzone, saturation) for axis in calibration)
+            for calibration in (self._STICK_L_CALIBRATION, self._STICK_R_CALIBRATION)
+        )
+        return tables
+
+    def stick_of(self, snapshot, left):
+        """like `stick_l` (or `stick_r` if not `left`), for a snapshot from `snapshot()`"""
+        tables = self._stick_tables or self._build_stick_tables()
+        if left:
+            (tx, ty), (x, y) = tables[0], snapshot.stick_l
+        else:
+            (tx, ty), (x, y) = tables[1], snapshot.stick_r
+        return tx[x], ty[y]
+
     @property
     def stick_l(self):
-        return (
-            self.get_stick_left_horizontal(),
-            self.get_stick_left_vertical(),
-        )
+        tx, ty = (self._stick_tables or self._build_stick_tables())[0]
+        x, y = self._input_state.stick_l
+        return tx[x], ty[y]
 
     @property
     def stick_r(self):
-        return (
-            self.get_stick_right_horizontal(),
-            self.get_stick_right_vertical(),
-        )
+        tx, ty = (self._stick_tables or self._build_stick_tables())[1]
+        x, y = self._input_state.stick_r
+        return tx[x], ty[y]
 
     @property
-    def accel(self):
-        c = self._ime_yz_coeff
+    def stick_l_raw(self):
+        return self._input_state.stick_l
+
+    @property
+    def stick_r_raw(self):
+        return self._input_state.stick_r
+
+    def _scaled_accel(self, c, state=None):
+        c2 = c * self._ime_yz_coeff
+        ox, oy, oz = self._ACCEL_OFFSET_X, self._ACCEL_OFFSET_Y, self._ACCEL_OFFSET_Z
+        kx, ky, kz = self._ACCEL_COEFF_X, self._ACCEL_COEFF_Y, self._ACCEL_COEFF_Z
         return [
-            (
-                self.get_accel_x(i),
-                self.get_accel_y(i) * c,
-                self.get_accel_z(i) * c,
-            )
-            for i in range(3)
+            ((x - ox) * kx * c, (y - oy) * ky * c2, (z - oz) * kz * c2)
+            for x, y, z in (state or self._input_state).accel
         ]
 
-    @property
-    def accel_in_g(self):
-        c = 4.0 / 0x4000
+    def _scaled_gyro(self, c, state=None):
         c2 = c * self._ime_yz_coeff
+        ox, oy, oz = self._GYRO_OFFSET_X, self._GYRO_OFFSET_Y, self._GYRO_OFFSET_Z
+        kx, ky, kz = self._GYRO_COEFF_X, self._GYRO_COEFF_Y, self._GYRO_COEFF_Z
         return [
-            (
-                self.get_accel_x(i) * c,
-                self.get_accel_y(i) * c2,
-                self.get_accel_z(i) * c2,
-            )
-            for i in range(3)
+            ((x - ox) * kx * c, (y - oy) * ky * c2, (z - oz) * kz * c2)
+            for x, y, z in (state or self._input_state).gyro
         ]
 
+    def accel_of(self, snapshot, unit="raw"):
+        """like `accel` or `accel_in_g` (unit "g"), for a snapshot from `snapshot()`"""
+        return self._scaled_accel(self._ACCEL_UNITS[unit], snapshot)
+
+    def gyro_of(self, snapshot, unit="raw"):
+        """like `gyro` or `gyro_in_deg/rad/rot` (unit "deg"/"rad"/"rot"), for a snapshot from `snapshot()`"""
+        return self._scaled_gyro(self._GYRO_UNITS[unit], snapshot)
+
+    @property
+    def accel(self):
+        return self._scaled_accel(1)
+
+    @property
+    def accel_in_g(self):
+        return self._scaled_accel(self._ACCEL_UNITS["g"])
+
     @property
     def gyro(self):
-        c = self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i),
-                self.get_gyro_y(i) * c,
-                self.get_gyro_z(i) * c,
-            )
-            for i in range(3)
-        ]
+        return self._scaled_gyro(1)
 
     @property
     def gyro_in_deg(self):
-        c = 0.06103
-        c2 = c * self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i) * c,
-                self.get_gyro_y(i) * c2,
-                self.get_gyro_z(i) * c2,
-            )
-            for i in range(3)
-        ]
+        return self._scaled_gyro(self._GYRO_UNITS["deg"])
 
     @property
     def gyro_in_rad(self):
-        c = 0.0001694 * 3.1415926536
-        c2 = c * self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i) * c,
-                self.get_gyro_y(i) * c2,
-                self.get_gyro_z(i) * c2,
-            )
-            for i in range(3)
-        ]
+        return self._scaled_gyro(self._GYRO_UNITS["rad"])
 
     @property
     def gyro_in_rot(self):
-        c = 0.0001694
-        c2 = c * self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i) * c,
-                self.get_gyro_y(i) * c2,
-                self.get_gyro_z(i) * c2,
-            )
-            for i in range(3)
-        ]
+        return self._scaled_gyro(self._GYRO_UNITS["rot"])
+
+    def imu_array(self, reports=None, accel_unit="raw", gyro_unit="raw", out=None):
+        """
+        Returns the calibrated IMU samples of the current report as a float32
+        NumPy array of shape `(3, 6)`, each row being `(ax, ay, az, gx, gy, gz)`.
+        If `reports` is given (see `imu.raw_imu`) all of them are calibrated
+        at once into an array of shape `(n, 3, 6)`.
+
+        accel_unit: "raw" or "g", gyro_unit: "raw", "deg", "rad" or "rot"
+        """
+        calibration = self._imu_calibration.get((accel_unit, gyro_unit))
+        if calibration is None:
+            a = self._ACCEL_UNITS[accel_unit]
+            g = self._GYRO_UNITS[gyro_unit]
+            c = self._ime_yz_coeff
+            calibration = self._imu_calibration[accel_unit, gyro_unit] = imu.imu_scale((
+                self._ACCEL_OFFSET_X, self._ACCEL_OFFSET_Y, self._ACCEL_OFFSET_Z,
+                self._GYRO_OFFSET_X,  self._GYRO_OFFSET_Y,  self._GYRO_OFFSET_Z,
+            ), (
+                self._ACCEL_COEFF_X * a, self._ACCEL_COEFF_Y * a * c, self._ACCEL_COEFF_Z * a * c,
+                self._GYRO_COEFF_X * g,  self._GYRO_COEFF_Y * g * c,  self._GYRO_COEFF_Z * g * c,
+            ))
+        raw = imu.raw_imu(self._input_report if reports is None else reports)
+        return imu.calibrate_imu(raw, *calibration, out=out)
@@ -0,0 +1,51 @@
+import pytest
+from pyjoycon import JoyCon
+from pyjoycon.constants import JOYCON_R_PRODUCT_ID, JOYCON_VENDOR_ID
+from pyjoycon.emulator import EmulatedJoyCon
+
+
+@pytest.fixture
+def connect():
+    """
+    returns a function constructing a `joycon_class` on an `EmulatedJoyCon`,
+    which returns both, `setup(emulator)` runs before the JoyCon connects.
+    They are closed after the test.
+    """
+    joycons = []
+
+    def connect(joycon_class=JoyCon, product_id=JOYCON_R_PRODUCT_ID, setup=None, **kwargs):
+        emulators = []
+
+        def backend(*args, **kw):
+            emulator = EmulatedJoyCon(*args, **kw)
+            if setup is not None:
+                setup(emulator)
+            emulators.append(emulator)
+            return emulator
+
+        joycon = joycon_class(JOYCON_VENDOR_ID, product_id, backend=backend, **kwargs)
+        joycons.append(joycon)
+        return joycon, emulators[0]
+
+    yield connect
+    for joycon in joycons:
+        joycon.close()
+
+
+def count_writes(emulator, subcommand, lose=()):
+    """
+    counts the output reports with `subcommand` written to `emulator` into
+    the returned list, the ones numbered in `lose` (from 1) never arrive
+    """
+    writes = []
+    write = emulator.write
+
+    def counting_write(data):
+        if data[0] == 0x01 and data[10] == subcommand:
+            writes.append(bytes(data))
+            if len(writes) in lose:
+                return len(data)
+        return write(data)
+
+    emulator.write = counting_write
+    return writes
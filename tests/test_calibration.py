@@ -0,0 +1,70 @@
+import json
+from pyjoycon import PythonicJoyCon
+from pyjoycon.cache import CalibrationCache
+from pyjoycon.stick import DEFAULT_CALIBRATION, USER_MAGIC, read_stick_calibration
+from pyjoycon.emulator import _pack_stick_calibration
+from conftest import count_writes
+
+MAC = bytes((0x98, 0xB6, 0xE9, 0x12, 0x34, 0x56))
+FACTORY = ((648, 2048, 3448), (648, 2048, 3448))
+SPI_READ = 0x10
+
+
+def fixed_mac(emulator):
+    emulator.mac_address = MAC
+
+
+def read_stick(joycon):
+    joycon._joycon_device.report_rate = None  # the next report right away
+    joycon._handle_report(joycon._read_input_report())
+    return joycon.stick_r
+
+
+def test_factory_stick_calibration(connect):
+    joycon, emulator = connect(PythonicJoyCon, threaded=False)
+    assert joycon._STICK_R_CALIBRATION == FACTORY
+    emulator.stick_r = (2048, 2048)
+    assert read_stick(joycon) == (0.0, 0.0)
+    emulator.stick_r = (3448, 648)
+    assert read_stick(joycon) == (1.0, -1.0)
+
+
+def test_user_stick_calibration_is_preferred():
+    factory = bytes(_pack_stick_calibration((1400, 1400), (2048, 2048), (1400, 1400)))
+    factory += bytes(_pack_stick_calibration((2048, 2048), (1400, 1400), (1400, 1400)))
+    user_right = USER_MAGIC + bytes(_pack_stick_calibration((2000, 2100), (1000, 1000), (1200, 1200)))
+    left, right = read_stick_calibration(factory, b"\xFF" * 11 + user_right)
+    assert left == FACTORY
+    assert right == ((1000, 2000, 3200), (1100, 2100, 3300))
+
+
+def test_missing_stick_calibration():
+    assert read_stick_calibration(b"\xFF" * 18, b"\xFF" * 22) == (DEFAULT_CALIBRATION, DEFAULT_CALIBRATION)
+
+
+def test_cache_skips_spi_reads(connect, tmp_path):
+    cache = CalibrationCache(str(tmp_path / "calibration.json"))
+    first, _ = connect(PythonicJoyCon, threaded=False, setup=fixed_mac, calibration_cache=cache)
+    first.close()
+
+    reads = []
+    cache = CalibrationCache(str(tmp_path / "calibration.json"))  # loaded from the file
+    joycon, _ = connect(PythonicJoyCon, threaded=False, calibration_cache=cache,
+                        setup=lambda e: (fixed_mac(e), reads.append(count_writes(e, SPI_READ))))
+    assert reads == [[]]
+    assert joycon._STICK_R_CALIBRATION == FACTORY
+    assert joycon._calibration_spi == first._calibration_spi
+
+
+def test_broken_cache_is_read_again(connect, tmp_path):
+    path = tmp_path / "calibration.json"
+    for content in ("not json", '{"version": 1, "entries": []}',
+                    '{"version": 1, "entries": {"98:b6:e9:12:34:56": {"spi": 3}}}'):
+        path.write_text(content)
+        reads = []
+        joycon, _ = connect(PythonicJoyCon, threaded=False, calibration_cache=CalibrationCache(str(path)),
+                            setup=lambda e: (fixed_mac(e), reads.append(count_writes(e, SPI_READ))))
+        assert reads[0]
+        assert joycon._STICK_R_CALIBRATION == FACTORY
+        entries = json.loads(path.read_text())["entries"]
+        assert entries["98:b6:e9:12:34:56"]["product_id"] == joycon.product_id
@@ -0,0 +1,69 @@
+import time
+from pyjoycon import JoyCon, IRRegisters
+from pyjoycon.ir import IRFrameBuffer
+
+SIZE = IRFrameBuffer.FRAGMENT_SIZE
+
+
+def fragment(i):
+    return bytes((i,)) * SIZE
+
+
+def test_reassembly_out_of_order():
+    frames = IRFrameBuffer(4, 40)
+    for i in (0, 2, 3):
+        assert frames.write(i, fragment(i))
+    assert not frames.write(2, fragment(9))  # already received
+    assert frames.next_missing(frames.highest) == 1
+    assert frames.write(1, fragment(1))
+    assert frames.received == frames.fragments
+    frames.complete()
+    assert bytes(frames.frame) == b"".join(fragment(i) for i in range(4))
+    assert frames.frames_completed == 1
+    assert frames.fragments_retransmitted == 1
+
+
+def test_retransmissions_count_answered_requests():
+    frames = IRFrameBuffer(4, 40)
+    frames.write(0, fragment(0))
+    frames.write(3, fragment(3))
+    for _ in range(5):  # asked again while it does not arrive
+        frames.next_missing(frames.highest)
+    assert frames.fragments_retransmitted == 0
+    frames.write(1, fragment(1))
+    frames.write(2, fragment(2))
+    assert frames.fragments_retransmitted == 2
+
+
+def test_late_fragments_of_a_dropped_frame_are_ignored():
+    frames = IRFrameBuffer(4, 40)
+    frames.write(0, fragment(0))
+    frames.write(1, fragment(1))
+    frames.drop()
+    assert frames.frames_dropped == 1
+    assert not frames.write(2, fragment(2))
+    assert not frames.write(3, fragment(3))
+    assert frames.received == 0
+    for i in range(4):
+        assert frames.write(i, fragment(10 + i))
+    frames.complete()
+    assert bytes(frames.frame) == b"".join(fragment(10 + i) for i in range(4))
+
+
+def test_frames_complete_despite_fragment_loss(connect):
+    registers = IRRegisters()
+    registers.defaults(JoyCon.IR_IMAGE)
+    registers.resolution = 40
+
+    def setup(emulator):
+        emulator.report_rate = 1000
+        emulator.ir_fragment_loss = 0.1
+
+    joycon, emulator = connect(setup=setup, ir_mode=JoyCon.IR_IMAGE, ir_registers=registers)
+    deadline = time.monotonic() + 5
+    while joycon.get_ir_stats()["frames_completed"] < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = joycon.get_ir_stats()
+    assert stats["frames_completed"] >= 5
+    assert stats["fragments_retransmitted"] > 0
+    assert bytes(joycon.get_ir_image()) == bytes(emulator.ir_image)
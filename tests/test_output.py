@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import Future
+import pytest
+from pyjoycon.output import OutputScheduler
+
+
+def recorder(written):
+    def write(name, future):
+        written.append((name, time.monotonic()))
+    return write
+
+
+def names(written):
+    return [name for name, _ in written]
+
+
+def test_urgent_before_coalesced():
+    written = []
+    scheduler = OutputScheduler()
+    queue = scheduler.queue(recorder(written), interval=0.001)
+    queue.submit(("lamp 1", None), coalesce="lamp")
+    queue.submit(("a", None))
+    queue.submit(("lamp 2", None), coalesce="lamp")
+    queue.submit(("b", None))
+    scheduler.start()
+    scheduler.close()
+    assert names(written) == ["a", "b", "lamp 2"]
+    assert queue.coalesced == 1
+
+
+def test_carried_state_rides_along():
+    written = []
+    scheduler = OutputScheduler()
+    queue = scheduler.queue(recorder(written), interval=0.001, carried=("rumble",))
+    queue.submit(("rumble", None), coalesce="rumble")
+    queue.submit(("a", None))
+    scheduler.start()
+    scheduler.close()
+    assert names(written) == ["a"]
+
+
+def test_pacing():
+    written = []
+    scheduler = OutputScheduler()
+    queue = scheduler.queue(recorder(written), interval=0.02)
+    scheduler.start()
+    for i in range(5):
+        queue.submit((i, None))
+    scheduler.close()
+    times = [t for _, t in written]
+    assert names(written) == list(range(5))
+    assert min(b - a for a, b in zip(times, times[1:])) >= 0.019
+
+
+def test_shared_scheduler_paces_each_queue():
+    threads = threading.active_count()
+    scheduler = OutputScheduler()
+    scheduler.start()
+    logs = ([], [])
+    queues = [scheduler.queue(recorder(log), interval=0.05) for log in logs]
+    start = time.monotonic()
+    for i in range(3):
+        for queue in queues:
+            queue.submit((i, None))
+    for queue in queues:
+        queue.close()
+    assert threading.active_count() == threads + 1
+    # interleaved, not 0.25 s one after the other
+    assert time.monotonic() - start < 0.2
+    for log in logs:
+        times = [t for _, t in log]
+        assert names(log) == [0, 1, 2]
+        assert min(b - a for a, b in zip(times, times[1:])) >= 0.049
+    scheduler.close()
+
+
+def test_withdraw():
+    written = []
+    scheduler = OutputScheduler()
+    queue = scheduler.queue(recorder(written), interval=0.001)
+    future = Future()
+    queue.submit(("a", None))
+    queue.submit(("b", future))
+    assert queue.withdraw(future)
+    assert not queue.withdraw(future)
+    scheduler.start()
+    scheduler.close()
+    assert names(written) == ["a"]
+
+
+def test_close_fails_waiting_reports():
+    scheduler = OutputScheduler()
+    queue = scheduler.queue(recorder([]))
+    future = Future()
+    queue.submit(("a", future))
+    scheduler.close(0)
+    with pytest.raises(IOError):
+        future.result(0)
+    with pytest.raises(IOError):
+        queue.submit(("b", None))
@@ -0,0 +1,50 @@
+import time
+from pyjoycon.emulator import EmulatedJoyCon
+from pyjoycon.rumble import IDLE, HIGH_FREQ_RANGE, LOW_FREQ_RANGE, encode_rumble
+
+
+def test_idle():
+    assert encode_rumble() == IDLE
+
+
+def test_full_amplitude():
+    assert encode_rumble(high_amp=1.0, low_amp=1.0) == bytes((0x00, 0xC9, 0x40, 0x72))
+
+
+def test_amplitude_grows():
+    values = [encode_rumble(high_amp=a / 10)[1] for a in range(11)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+
+
+def test_frequencies_are_clamped():
+    assert encode_rumble(high_freq=5000) == encode_rumble(high_freq=HIGH_FREQ_RANGE[1])
+    assert encode_rumble(low_freq=5000) == encode_rumble(low_freq=LOW_FREQ_RANGE[1])
+    assert encode_rumble(high_freq=-1) == encode_rumble(high_freq=0)
+
+
+def test_ignored_until_vibration_is_enabled():
+    emulator = EmulatedJoyCon()
+    report = bytes((0x10, 0)) + encode_rumble(high_amp=1.0) * 2 + bytes(39)
+    emulator.write(report)
+    assert emulator.rumble == IDLE * 2
+    emulator.write(bytes((0x01, 0)) + IDLE * 2 + bytes((0x48, 0x01)) + bytes(37))
+    emulator.write(report)
+    assert emulator.rumble == encode_rumble(high_amp=1.0) * 2
+    emulator.close()
+
+
+def test_set_rumble(connect):
+    joycon, emulator = connect()
+    assert emulator.vibration
+    joycon.set_rumble(high_freq=320, high_amp=0.5, low_freq=160, low_amp=0.3)
+    expected = encode_rumble(320, 0.5, 160, 0.3) * 2
+    deadline = time.monotonic() + 1
+    while emulator.rumble != expected and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert emulator.rumble == expected
+    joycon.stop_rumble()
+    deadline = time.monotonic() + 1
+    while emulator.rumble != IDLE * 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert emulator.rumble == IDLE * 2
@@ -0,0 +1,65 @@
+import threading
+import pytest
+from conftest import count_writes
+
+SPI_READ = 0x10
+
+
+def test_reply_while_reader_runs(connect):
+    joycon, emulator = connect()
+    assert joycon._reader_ident is not None
+    assert joycon._spi_flash_read(0x6050, 6) == bytes(emulator.spi_flash[0x6050:0x6056])
+
+
+def test_concurrent_subcommands(connect):
+    joycon, emulator = connect()
+    addresses = [0x6000 + 0x10 * i for i in range(8)]
+    for i, address in enumerate(addresses):
+        emulator.spi_flash[address:address + 4] = bytes((i, i, i, i))
+    results = {}
+
+    def read(address):
+        results[address] = joycon._spi_flash_read(address, 4)
+
+    threads = [threading.Thread(target=read, args=(address,)) for address in addresses]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {address: bytes((i, i, i, i)) for i, address in enumerate(addresses)}
+
+
+def test_lost_reply_is_retried(connect):
+    joycon, emulator = connect(metrics=True)
+    writes = count_writes(emulator, SPI_READ, lose={1})
+    assert joycon._spi_flash_read(0x6050, 6) == bytes(emulator.spi_flash[0x6050:0x6056])
+    assert len(writes) == 2
+    assert joycon.metrics.confirm_retries == 1
+
+
+def test_unconfirmed_subcommand_raises(connect):
+    joycon, emulator = connect()
+    writes = count_writes(emulator, SPI_READ, lose=range(1, 100))
+    with pytest.raises(IOError):
+        joycon._write_output_report(b'\x01', b'\x10', b'\x50\x60\x00\x00\x06',
+                                    confirm=((0, 0x21), (14, 0x10)), confirmRetries=2)
+    assert len(writes) == 2
+
+
+def test_timeout_starts_when_written(connect):
+    # 20 reports 50 ms apart wait longer than the reply timeout in the queue
+    joycon, emulator = connect(metrics=True, output_interval=0.05)
+    writes = count_writes(emulator, SPI_READ)
+    threads = [threading.Thread(target=joycon._spi_flash_read, args=(0x6050, 6)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(writes) == 20
+    assert joycon.metrics.confirm_retries == 0
+
+
+def test_subcommand_without_reader(connect):
+    joycon, emulator = connect(threaded=False)
+    assert joycon._reader_ident is None
+    assert joycon._spi_flash_read(0x6050, 6) == bytes(emulator.spi_flash[0x6050:0x6056])